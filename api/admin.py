@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Center, Section, Subscription, Schedule, Record, SectionCategory, Feedback
+from .models import Center, Section, Subscription, Schedule, Record, SectionCategory, Feedback, GeocodeCache
 
 @admin.register(SectionCategory)
 class SectionCategoryAdmin(admin.ModelAdmin):
@@ -25,6 +25,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'type', 'start_date', 'end_date', 'is_active', 'is_activated_by_admin')
     search_fields = ('user__email', 'user__phone_number')
     list_filter = ('type', 'is_active', 'is_activated_by_admin')
+    readonly_fields = ('lessons_booked', 'lessons_attended', 'lessons_canceled')
 
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
@@ -44,3 +45,7 @@ class FeedbackAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'center__name')
     list_filter = ('stars', 'center')
 
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ('address_key', 'latitude', 'longitude', 'created_at')
+    search_fields = ('address_key',)
@@ -6,3 +6,4 @@ class ApiConfig(AppConfig):
     
     def ready(self):
         import api.tasks
+        import api.signals
@@ -0,0 +1,183 @@
+"""
+Автодополнение по названиям центров, секций и категорий.
+
+Каждый процесс держит в памяти отсортированный массив ключей и ищет по нему
+бинарным поиском. Изменения идут через журнал в общем кэше: сигналы
+post_save/post_delete увеличивают счётчик версии и кладут под новым номером
+запись (тип, id, название). Процесс, отставший от версии, применяет эти
+записи к своему массиву через insort/удаление, без пересборки. Если записей
+журнала не хватает, индекс собирается заново из снимка в кэше или из БД.
+Без общего кэша (LocMemCache) журнал виден только своему процессу, поэтому
+индекс пересобирается не реже раза в LOCAL_SNAPSHOT_TIMEOUT секунд.
+"""
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from core.caches import shared_cache_configured
+
+SNAPSHOT_KEY = 'autocomplete:snapshot'
+VERSION_KEY = 'autocomplete:version'
+DELTA_KEY = 'autocomplete:delta:{version}'
+DELTA_TIMEOUT = 24 * 60 * 60
+# Отставание больше этого числа изменений дешевле догнать пересборкой
+MAX_DELTAS = 1000
+# Без общего кэша снимок виден только своему процессу: пересобираем его из БД
+# не реже этого интервала, чтобы правки из других воркеров доходили до поиска
+LOCAL_SNAPSHOT_TIMEOUT = 60
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Сколько совпадений по префиксу ранжируется (короткие префиксы совпадают со многим)
+MAX_CANDIDATES = 500
+
+
+def normalize_name(name):
+    name = unicodedata.normalize('NFKC', name or '').casefold().replace('ё', 'е')
+    return ' '.join(re.findall(r'\w+', name))
+
+
+def _indexed_models():
+    from .models import Center, Section, SectionCategory
+    return {'center': Center, 'section': Section, 'category': SectionCategory}
+
+
+def object_type(instance):
+    for type_name, model in _indexed_models().items():
+        if isinstance(instance, model):
+            return type_name
+    return None
+
+
+def build_snapshot(version):
+    entries = {}
+    for type_name, model in _indexed_models().items():
+        for pk, name in model.objects.values_list('id', 'name'):
+            entries[(type_name, pk)] = name
+    return {'version': version, 'entries': entries}
+
+
+def _name_keys(type_name, pk, name):
+    words = normalize_name(name).split()
+    # Ключ для каждого слова, чтобы "футбол" находил и "Школа футбола"
+    return [(' '.join(words[position:]), position, type_name, pk) for position in range(len(words))]
+
+
+class PrefixIndex:
+    def __init__(self, snapshot):
+        self.version = snapshot['version']
+        self.names = dict(snapshot['entries'])
+        self.built_at = time.monotonic()
+        keys = []
+        for (type_name, pk), name in self.names.items():
+            keys.extend(_name_keys(type_name, pk, name))
+        keys.sort()
+        self.keys = keys
+
+    def is_expired(self):
+        return not shared_cache_configured() and time.monotonic() - self.built_at > LOCAL_SNAPSHOT_TIMEOUT
+
+    def apply(self, type_name, pk, name):
+        """Заменяет ключи одного объекта; name=None удаляет его из индекса."""
+        old_name = self.names.pop((type_name, pk), None)
+        if old_name is not None:
+            for key in _name_keys(type_name, pk, old_name):
+                position = bisect_left(self.keys, key)
+                if position < len(self.keys) and self.keys[position] == key:
+                    del self.keys[position]
+        if name is not None:
+            self.names[(type_name, pk)] = name
+            for key in _name_keys(type_name, pk, name):
+                insort(self.keys, key)
+
+    def catch_up(self, version):
+        """
+        Применяет записи журнала до version. False — догнать нельзя
+        (индекс новее версии в кэше, отставание велико или записи истекли).
+        """
+        if version == self.version:
+            return True
+        if version < self.version or version - self.version > MAX_DELTAS:
+            return False
+        keys = [DELTA_KEY.format(version=number) for number in range(self.version + 1, version + 1)]
+        deltas = cache.get_many(keys)
+        if len(deltas) != len(keys):
+            return False
+        for key in keys:
+            self.apply(*deltas[key])
+        self.version = version
+        return True
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        matches = {}
+        start = bisect_left(self.keys, (prefix,))
+        for index in range(start, min(start + MAX_CANDIDATES, len(self.keys))):
+            key, position, type_name, pk = self.keys[index]
+            if not key.startswith(prefix):
+                break
+            if (type_name, pk) not in matches or position < matches[(type_name, pk)]:
+                matches[(type_name, pk)] = position
+        # Совпадения с начала названия выше, затем более короткие названия
+        ranked = sorted(matches.items(), key=lambda item: (item[1], len(self.names[item[0]]), self.names[item[0]]))
+        return [
+            {'type': type_name, 'id': pk, 'name': self.names[(type_name, pk)]}
+            for (type_name, pk), _ in ranked[:limit]
+        ]
+
+
+_local = {'index': None}
+_local_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Отсчёт от времени в мс: после сброса кэша номера не повторяют прежние,
+        # и процессы со старым индексом не примут его за актуальный
+        version = int(time.time() * 1000)
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _load(version):
+    """Индекс версии version: из снимка в кэше с догонкой по журналу или из БД."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is not None:
+        index = PrefixIndex(snapshot)
+        if index.catch_up(version):
+            return index
+    # Версия прочитана до запроса к БД: изменения после неё придут из журнала
+    snapshot = build_snapshot(version)
+    cache.set(SNAPSHOT_KEY, snapshot, None if shared_cache_configured() else LOCAL_SNAPSHOT_TIMEOUT)
+    return PrefixIndex(snapshot)
+
+
+def search(query, limit=DEFAULT_LIMIT):
+    version = _current_version()
+    # Индекс меняется на месте, поэтому и поиск идёт под блокировкой
+    with _local_lock:
+        index = _local['index']
+        if index is None or index.is_expired() or not index.catch_up(version):
+            index = _local['index'] = _load(version)
+        return index.search(query, limit)
+
+
+def update_entry(type_name, pk, name=None):
+    """
+    Записывает изменение объекта в журнал (name=None — объект удалён).
+    Процессы применят его при следующем поиске.
+    """
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # Версии в кэше нет: индексы соберутся заново при следующем поиске
+        return
+    cache.set(DELTA_KEY.format(version=version), (type_name, pk, name), DELTA_TIMEOUT)
@@ -0,0 +1,170 @@
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.caches import shared_cache_configured
+
+MODEL_VERSION_KEY = 'catalog:version:{}'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+# Кэш в памяти процесса не видит смены версий в других воркерах, поэтому
+# без общего кэша ответы живут недолго: это граница устаревания каталога
+LOCAL_RESPONSE_CACHE_TIMEOUT = 30
+
+# Сколько ждать, пока другой процесс считает тот же ответ (single-flight)
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_WAIT = 2.0
+SINGLE_FLIGHT_POLL = 0.02
+
+
+def get_model_versions(labels):
+    """Версии моделей каталога; меняются при любом изменении данных модели."""
+    keys = [MODEL_VERSION_KEY.format(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex[:12], None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(label):
+    cache.set(MODEL_VERSION_KEY.format(label), uuid.uuid4().hex[:12], None)
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list/retrieve. Валидаторы считаются одним
+    агрегатным запросом MAX(updated_at) + COUNT(*) по отфильтрованному queryset,
+    и на совпавший If-None-Match / If-Modified-Since отвечаем 304 без сериализации.
+    """
+
+    def get_cache_scope(self, request):
+        return 'public'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, 'list', None, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_value = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.conditional_response(request, 'retrieve', lookup_value, super().retrieve, *args, **kwargs)
+
+    def compute_validators(self, request, action, lookup_value):
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            if action == 'retrieve':
+                queryset = queryset.filter(**{self.lookup_field: lookup_value})
+            state = queryset.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        except (ValueError, TypeError, ValidationError):
+            # Некорректный lookup (например, /centers/abc/) — пусть обычный путь вернёт 404
+            return None
+        if action == 'retrieve' and not state['count']:
+            return None
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        raw = f"{self.basename}:{action}:{lookup_value}:{self.get_cache_scope(request)}:{params}:{state['last_modified']}:{state['count']}"
+        # Удаление строки из списка не меняет MAX(updated_at), поэтому для list
+        # Last-Modified не отдаём и проверяем только ETag (в нём учтён COUNT)
+        last_modified = state['last_modified'] if action == 'retrieve' else None
+        return '"%s"' % hashlib.md5(raw.encode()).hexdigest(), last_modified
+
+    def get_validators(self, request, action, lookup_value):
+        return self.compute_validators(request, action, lookup_value)
+
+    def render_response(self, request, action, lookup_value, handler, *args, **kwargs):
+        return handler(request, *args, **kwargs)
+
+    def conditional_response(self, request, action, lookup_value, handler, *args, **kwargs):
+        validators = self.get_validators(request, action, lookup_value)
+        if validators is None:
+            return self.render_response(request, action, lookup_value, handler, *args, **kwargs)
+
+        etag, last_modified = validators
+        if is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.render_response(request, action, lookup_value, handler, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        # Клиент может хранить ответ, но должен каждый раз перепроверять его
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if if_modified_since and last_modified is not None:
+        return int(last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Кэширует ответы list/retrieve для GET-запросов.
+
+    Ключ строится из действия, нормализованных query-параметров, области
+    видимости пользователя (get_cache_scope) и версий моделей из cache_models,
+    поэтому изменение любой из этих моделей сразу делает старые ответы недостижимыми.
+    Валидаторы ETag/Last-Modified кэшируются под тем же ключом.
+    """
+    cache_models = ()
+    cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_timeout(self):
+        return self.cache_timeout if shared_cache_configured() else min(self.cache_timeout, LOCAL_RESPONSE_CACHE_TIMEOUT)
+
+    def get_response_cache_key(self, request, action, pk=None):
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        digest = hashlib.md5(repr(params).encode()).hexdigest()
+        versions = '.'.join(get_model_versions(self.cache_models))
+        return f'response:{self.basename}:{action}:{pk}:{self.get_cache_scope(request)}:{versions}:{digest}'
+
+    def get_validators(self, request, action, lookup_value):
+        key = self.get_response_cache_key(request, action, lookup_value) + ':validators'
+        cached = cache.get(key)
+        if cached is not None:
+            return cached['validators']
+        validators = super().get_validators(request, action, lookup_value)
+        cache.set(key, {'validators': validators}, self.get_cache_timeout())
+        return validators
+
+    def render_response(self, request, action, lookup_value, handler, *args, **kwargs):
+        return self.cached_response(request, action, lookup_value, handler, *args, **kwargs)
+
+    def cached_response(self, request, action, lookup_value, handler, *args, **kwargs):
+        key = self.get_response_cache_key(request, action, lookup_value)
+        cached = cache.get(key)
+        if cached is not None:
+            return Response(cached)
+
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, SINGLE_FLIGHT_LOCK_TIMEOUT):
+            # Ответ уже считает другой запрос — подождём его результат
+            deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(SINGLE_FLIGHT_POLL)
+                cached = cache.get(key)
+                if cached is not None:
+                    return Response(cached)
+            return handler(request, *args, **kwargs)
+
+        try:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, self.get_cache_timeout())
+            return response
+        finally:
+            cache.delete(lock_key)
@@ -0,0 +1,102 @@
+"""
+Подписанные QR-токены для отметки посещения.
+
+Токен содержит запись, расписание, центр, пользователя и срок действия и
+подписан HMAC (SECRET_KEY), поэтому сканер сотрудника проверяет его без
+обращения к БД. Отметки применяются пачками: одно чтение и один UPDATE
+на весь пакет токенов.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Record, Subscription
+
+CHECKIN_SALT = 'api.checkin'
+# Сколько токен действует после окончания занятия
+CHECKIN_GRACE = timedelta(hours=1)
+MAX_CHECKIN_BATCH = 500
+
+_signer = signing.Signer(salt=CHECKIN_SALT)
+
+
+class CheckinTokenError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def token_expiry(schedule):
+    end = timezone.make_aware(datetime.combine(schedule.date, schedule.end_time))
+    return end + CHECKIN_GRACE
+
+
+def make_checkin_token(record):
+    schedule = record.schedule
+    expires_at = token_expiry(schedule)
+    payload = f'{record.id}:{schedule.id}:{schedule.section.center_id}:{record.user_id}:{int(expires_at.timestamp())}'
+    return _signer.sign(payload), expires_at
+
+
+def verify_checkin_token(token, now=None):
+    """Данные токена; CheckinTokenError('invalid' | 'expired'), если он не годится."""
+    try:
+        payload = _signer.unsign(token)
+        record_id, schedule_id, center_id, user_id, expires = map(int, payload.split(':'))
+    except (signing.BadSignature, ValueError, TypeError):
+        raise CheckinTokenError('invalid')
+    if (now or timezone.now()).timestamp() > expires:
+        raise CheckinTokenError('expired')
+    return {'record_id': record_id, 'schedule_id': schedule_id, 'center_id': center_id, 'user_id': user_id}
+
+
+def set_attendance(records, record_ids, attended=True):
+    """
+    Выставляет attended для записей из records (queryset задаёт область доступа)
+    одним UPDATE и поправляет счётчики посещений абонементов.
+    Статусы: updated, unchanged, canceled или not_found.
+    """
+    record_ids = set(record_ids)
+    statuses = dict.fromkeys(record_ids, 'not_found')
+    with transaction.atomic():
+        rows = (
+            records.select_for_update()
+            .filter(pk__in=record_ids)
+            .values_list('id', 'attended', 'is_canceled', 'subscription_id')
+        )
+        to_update = {}
+        for record_id, current, is_canceled, subscription_id in rows:
+            if is_canceled:
+                statuses[record_id] = 'canceled'
+            elif current == attended:
+                statuses[record_id] = 'unchanged'
+            else:
+                statuses[record_id] = 'updated'
+                to_update[record_id] = subscription_id
+        if to_update:
+            now = timezone.now()
+            Record.objects.filter(pk__in=to_update).update(attended=attended, updated_at=now)
+            step = 1 if attended else -1
+            per_subscription = Counter(to_update.values())
+            # Снизу ограничиваем нулём: посещения, отмеченные до появления счётчиков
+            # или через админку, в lessons_attended могут быть не учтены
+            Subscription.objects.filter(pk__in=per_subscription).update(
+                lessons_attended=Greatest(F('lessons_attended') + Case(
+                    *(When(pk=pk, then=Value(count * step)) for pk, count in per_subscription.items()),
+                    default=Value(0), output_field=IntegerField(),
+                ), Value(0)),
+                updated_at=now,
+            )
+    return statuses
+
+
+def apply_checkins(record_ids):
+    """Отмечает посещение по проверенным токенам: checked_in, already_checked_in, canceled или not_found."""
+    names = {'updated': 'checked_in', 'unchanged': 'already_checked_in'}
+    statuses = set_attendance(Record.objects.all(), record_ids)
+    return {record_id: names.get(value, value) for record_id, value in statuses.items()}
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Min
+
+from .geo import GRID_CELL_DEGREES, GRID_LNG_CELLS, MAX_TILE_ZOOM, tile_bounds, tile_for_point
+from .models import Center
+
+TILE_CACHE_KEY = 'centers:clusters:{}:{}:{}'
+TILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Примерно столько кластеров по ширине тайла
+CLUSTERS_PER_TILE_SIDE = 8
+
+
+def cluster_cell_factor(zoom):
+    """Сколько ячеек сетки (по каждой оси) объединяется в один кластер на этом зуме."""
+    cluster_degrees = 360.0 / 2 ** zoom / CLUSTERS_PER_TILE_SIDE
+    return max(1, int(cluster_degrees / GRID_CELL_DEGREES))
+
+
+def compute_tile_clusters(zoom, x, y):
+    south, north, west, east = tile_bounds(zoom, x, y)
+    factor = cluster_cell_factor(zoom)
+    rows = (
+        Center.objects
+        .filter(
+            grid_cell__isnull=False,
+            latitude__gte=south, latitude__lt=north,
+            longitude__gte=west, longitude__lt=east,
+        )
+        .annotate(
+            cluster_lat=F('grid_cell') / GRID_LNG_CELLS / factor,
+            cluster_lng=F('grid_cell') % GRID_LNG_CELLS / factor,
+        )
+        .values('cluster_lat', 'cluster_lng')
+        .annotate(
+            count=Count('id'),
+            lat=Avg('latitude'),
+            lng=Avg('longitude'),
+            min_id=Min('id'),
+            max_id=Max('id'),
+        )
+    )
+    return [{
+        'count': row['count'],
+        'latitude': round(float(row['lat']), 6),
+        'longitude': round(float(row['lng']), 6),
+        'ids': sorted({row['min_id'], row['max_id']}),
+    } for row in rows]
+
+
+def get_clusters(tiles):
+    """Кластеры для списка тайлов (zoom, x, y); каждый тайл кэшируется отдельно."""
+    keys = {TILE_CACHE_KEY.format(*tile): tile for tile in tiles}
+    cached = cache.get_many(keys)
+    missing = {key: compute_tile_clusters(*tile) for key, tile in keys.items() if key not in cached}
+    if missing:
+        cache.set_many(missing, TILE_CACHE_TIMEOUT)
+    clusters = []
+    for key in keys:
+        clusters.extend(cached.get(key) or missing.get(key) or [])
+    return clusters
+
+
+def invalidate_point(lat, lng):
+    """Сбрасывает тайлы всех зумов, в которые попадает точка."""
+    if lat is None or lng is None:
+        return
+    cache.delete_many([
+        TILE_CACHE_KEY.format(*tile_for_point(lat, lng, zoom))
+        for zoom in range(MAX_TILE_ZOOM + 1)
+    ])
@@ -1,15 +1,72 @@
 from django_filters import rest_framework as filters
-from .models import Section, Center
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
+from .models import Section, Center, Subscription
+from .geo import bounding_box, grid_cells_for_box, distance_km_expression
+from .search import is_indexed, search_queryset
+
+DEFAULT_NEAR_RADIUS_KM = 10
+MAX_NEAR_RADIUS_KM = 500
 
 class CenterFilter(filters.FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='icontains')
     description = filters.CharFilter(field_name='description', lookup_expr='icontains')
     location = filters.CharFilter(field_name='location', lookup_expr='icontains')
+    # ?near=43.238,76.889&radius_km=5 — центры в радиусе, ближайшие первыми
+    near = filters.CharFilter(method='filter_near')
+    radius_km = filters.NumberFilter(method='filter_radius_km')
 
     class Meta:
         model = Center
         fields = ['name', 'description', 'location', 'latitude', 'longitude']
 
+    def filter_radius_km(self, queryset, name, value):
+        # Используется в filter_near
+        return queryset
+
+    def filter_near(self, queryset, name, value):
+        try:
+            lat, lng = (float(part) for part in value.split(','))
+        except ValueError:
+            raise ValidationError({'near': 'Ожидается формат "широта,долгота".'})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'near': 'Координаты вне допустимого диапазона.'})
+
+        radius_km = self.form.cleaned_data.get('radius_km')
+        if radius_km is None:
+            radius_km = DEFAULT_NEAR_RADIUS_KM
+        if not 0 < radius_km <= MAX_NEAR_RADIUS_KM:
+            raise ValidationError({'radius_km': f'Радиус должен быть от 0 до {MAX_NEAR_RADIUS_KM} км.'})
+        radius_km = float(radius_km)
+
+        # Грубый отбор по индексам (ячейки сетки и прямоугольник),
+        # точное расстояние считается только для кандидатов
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        queryset = queryset.filter(
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lng, longitude__lte=max_lng,
+        )
+        cells = grid_cells_for_box(min_lat, max_lat, min_lng, max_lng)
+        if cells is not None:
+            queryset = queryset.filter(grid_cell__in=cells)
+
+        return (
+            queryset
+            .annotate(distance=distance_km_expression(lat, lng))
+            .filter(distance__lte=radius_km)
+            .order_by('distance')
+        )
+
+
+class CenterOrderingFilter(OrderingFilter):
+    """Сортировка по distance доступна только вместе с параметром near."""
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        valid_fields = super().remove_invalid_fields(queryset, fields, view, request)
+        if 'distance' not in queryset.query.annotations:
+            valid_fields = [term for term in valid_fields if term.lstrip('-') != 'distance']
+        return valid_fields
+
 
 from django_filters import rest_framework as filters
 from .models import Section
@@ -24,3 +81,29 @@ class SectionFilter(filters.FilterSet):
         model = Section
         fields = ['name', 'description', 'category', 'center']
 
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    ?search= через полнотекстовый индекс (api/search.py) с сортировкой
+    по релевантности. Для неиндексируемых моделей и прочих СУБД — обычный SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or not is_indexed(queryset.model):
+            return super().filter_queryset(request, queryset, view)
+
+        searched = search_queryset(queryset, ' '.join(search_terms))
+        if searched is None:
+            return super().filter_queryset(request, queryset, view)
+        # Уже заданная сортировка (например, по distance) сохраняет приоритет
+        return searched.order_by(*queryset.query.order_by, 'search_rank')
+
+
+class SubscriptionFilter(filters.FilterSet):
+    # is_active по фактической действительности (аннотация currently_active)
+    is_active = filters.BooleanFilter(field_name='currently_active')
+
+    class Meta:
+        model = Subscription
+        fields = ['type', 'is_active']
@@ -0,0 +1,100 @@
+import math
+
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0
+
+# Размер ячейки сетки в градусах (~11 км по широте)
+GRID_CELL_DEGREES = 0.1
+GRID_LNG_CELLS = int(360 / GRID_CELL_DEGREES)
+
+# Если прямоугольник поиска покрывает больше ячеек, фильтр по ячейкам
+# не используется и остаётся только диапазон широты/долготы
+MAX_GRID_CELLS = 400
+
+
+def _lat_index(lat):
+    return int(math.floor((float(lat) + 90) / GRID_CELL_DEGREES))
+
+
+def _lng_index(lng):
+    return min(int(math.floor((float(lng) + 180) / GRID_CELL_DEGREES)), GRID_LNG_CELLS - 1)
+
+
+def grid_cell(lat, lng):
+    """Номер ячейки сетки для точки или None, если координат нет."""
+    if lat is None or lng is None:
+        return None
+    return _lat_index(lat) * GRID_LNG_CELLS + _lng_index(lng)
+
+
+def bounding_box(lat, lng, radius_km):
+    """Прямоугольник (min_lat, max_lat, min_lng, max_lng), содержащий круг радиуса radius_km."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    lng_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+    return (
+        max(-90.0, lat - lat_delta),
+        min(90.0, lat + lat_delta),
+        max(-180.0, lng - lng_delta),
+        min(180.0, lng + lng_delta),
+    )
+
+
+def grid_cells_for_box(min_lat, max_lat, min_lng, max_lng):
+    """Список ячеек, покрывающих прямоугольник, или None, если их слишком много."""
+    lat_range = range(_lat_index(min_lat), _lat_index(max_lat) + 1)
+    lng_range = range(_lng_index(min_lng), _lng_index(max_lng) + 1)
+    if len(lat_range) * len(lng_range) > MAX_GRID_CELLS:
+        return None
+    return [lat_idx * GRID_LNG_CELLS + lng_idx for lat_idx in lat_range for lng_idx in lng_range]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_km_expression(lat, lng, lat_field='latitude', lng_field='longitude'):
+    """Расстояние по формуле гаверсинуса от точки (lat, lng) как выражение ORM."""
+    lat1 = math.radians(lat)
+    lng1 = math.radians(lng)
+    lat2 = Radians(Cast(F(lat_field), FloatField()))
+    lng2 = Radians(Cast(F(lng_field), FloatField()))
+    a = (
+        Power(Sin((lat2 - Value(lat1)) / 2), 2)
+        + Value(math.cos(lat1)) * Cos(lat2) * Power(Sin((lng2 - Value(lng1)) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+# Тайлы карты (Web Mercator, как у Google/OSM): z/x/y
+MAX_TILE_ZOOM = 20
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_for_point(lat, lng, zoom):
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, float(lat)))
+    n = 2 ** zoom
+    x = int((float(lng) + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """Границы тайла: (south, north, west, east)."""
+    n = 2 ** zoom
+
+    def tile_lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return tile_lat(y + 1), tile_lat(y), x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+
+
+def tiles_for_bbox(min_lat, max_lat, min_lng, max_lng, zoom):
+    _, min_x, max_y = tile_for_point(min_lat, min_lng, zoom)
+    _, max_x, min_y = tile_for_point(max_lat, max_lng, zoom)
+    return [(zoom, x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
@@ -0,0 +1,76 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+def normalize_address(address):
+    """Ключ кэша: без регистра, лишних пробелов и знаков препинания."""
+    address = unicodedata.normalize('NFKC', address or '').casefold()
+    address = re.sub(r'[^\w\s]', ' ', address)
+    return ' '.join(address.split())[:255]
+
+
+class BaseGeocoder:
+    """Геокодер возвращает (latitude, longitude) или None, если адрес не найден."""
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+
+class GoogleGeocoder(BaseGeocoder):
+    def __init__(self, api_key=None, timeout=5):
+        from geopy.geocoders import GoogleV3
+        api_key = api_key or settings.GOOGLE_API_KEY
+        if not api_key:
+            raise ImproperlyConfigured(
+                'GOOGLE_API_KEY is not set. Set it in the environment or use '
+                'GEOCODER_CLASS=api.geocoding.OfflineGeocoder.'
+            )
+        self.client = GoogleV3(api_key=api_key, timeout=timeout)
+
+    def geocode(self, address):
+        location = self.client.geocode(address)
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class OfflineGeocoder(BaseGeocoder):
+    """Геокодер без сети для тестов и локальной разработки: ищет адрес в словаре."""
+
+    def __init__(self, results=None):
+        results = results if results is not None else getattr(settings, 'OFFLINE_GEOCODER_RESULTS', {})
+        self.results = {normalize_address(address): coords for address, coords in results.items()}
+
+    def geocode(self, address):
+        return self.results.get(normalize_address(address))
+
+
+def get_geocoder():
+    return import_string(settings.GEOCODER_CLASS)()
+
+
+def geocode_address(address, geocoder=None):
+    """
+    Координаты адреса с учётом постоянного кэша (модель GeocodeCache).
+    В сеть обращается только при промахе кэша.
+    """
+    from .models import GeocodeCache
+
+    key = normalize_address(address)
+    if not key:
+        return None
+    cached = GeocodeCache.lookup(address)
+    if cached is not None:
+        return cached
+
+    coordinates = (geocoder or get_geocoder()).geocode(address)
+    if coordinates is not None:
+        GeocodeCache.objects.update_or_create(
+            address_key=key,
+            defaults={'latitude': coordinates[0], 'longitude': coordinates[1]},
+        )
+    return coordinates
@@ -0,0 +1,75 @@
+"""
+Уменьшенные копии картинок центров, секций и категорий.
+
+Варианты в WebP создаются фоновой задачей после загрузки картинки и лежат
+рядом с оригиналом в подкаталоге variants/ под именами из хэша содержимого,
+так что одна и та же картинка обрабатывается один раз. Пути вариантов
+хранятся в поле image_variants модели вместе с именем исходного файла.
+"""
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Вариант -> максимальный размер (ширина, высота)
+IMAGE_VARIANTS = {
+    'thumb': (128, 128),
+    'medium': (640, 640),
+}
+WEBP_QUALITY = 80
+
+
+def content_hash(field_file):
+    digest = hashlib.sha256()
+    with field_file.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def variant_name(original_name, digest, variant):
+    return posixpath.join(posixpath.dirname(original_name), 'variants', f'{digest}_{variant}.webp')
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buf = io.BytesIO()
+    variant.save(buf, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buf.getvalue()
+
+
+def build_variants(field_file):
+    """Создаёт недостающие варианты и возвращает значение для поля image_variants."""
+    digest = content_hash(field_file)
+    names = {variant: variant_name(field_file.name, digest, variant) for variant in IMAGE_VARIANTS}
+    missing = [variant for variant, name in names.items() if not default_storage.exists(name)]
+    if missing:
+        with field_file.open('rb') as fh:
+            image = ImageOps.exif_transpose(Image.open(fh))
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for variant in missing:
+            names[variant] = default_storage.save(names[variant], ContentFile(render_variant(image, IMAGE_VARIANTS[variant])))
+    return {'source': field_file.name, **names}
+
+
+def variants_are_stale(instance):
+    if not instance.image:
+        return bool(instance.image_variants)
+    return instance.image_variants.get('source') != instance.image.name
+
+
+def variant_urls(instance, request=None):
+    """URL вариантов для API; пока варианты не готовы — пустой словарь."""
+    if not instance.image or variants_are_stale(instance):
+        return {}
+    urls = {}
+    for variant in IMAGE_VARIANTS:
+        name = instance.image_variants.get(variant)
+        if name:
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.models import Center
+from api.geo import grid_cell
+
+
+class Command(BaseCommand):
+    help = 'Fills Center.grid_cell for centers with coordinates (used by ?near= search)'
+
+    def handle(self, *args, **kwargs):
+        centers = list(
+            Center.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .only('id', 'latitude', 'longitude', 'grid_cell')
+        )
+        changed = []
+        for center in centers:
+            cell = grid_cell(center.latitude, center.longitude)
+            if center.grid_cell != cell:
+                center.grid_cell = cell
+                changed.append(center)
+        Center.objects.bulk_update(changed, ['grid_cell'], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'Updated grid cells for {len(changed)} centers'))
@@ -0,0 +1,58 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from api.models import Center
+from api.geo import grid_cell
+from api.views import CenterViewSet
+
+# Алматы
+CENTER_LAT, CENTER_LNG = 43.238, 76.889
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks GET /api/centers/?near= on synthetic centers (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--radius-km', type=float, default=5)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        view = CenterViewSet.as_view({'get': 'list'})
+        factory = RequestFactory()
+
+        with transaction.atomic():
+            centers = []
+            for i in range(options['count']):
+                # Точки в квадрате ~1000x1000 км вокруг Алматы
+                lat = Decimal(f'{CENTER_LAT + rng.uniform(-4.5, 4.5):.6f}')
+                lng = Decimal(f'{CENTER_LNG + rng.uniform(-6, 6):.6f}')
+                centers.append(Center(
+                    name=f'Bench center {i}', location='bench',
+                    latitude=lat, longitude=lng, grid_cell=grid_cell(lat, lng),
+                ))
+            Center.objects.bulk_create(centers, batch_size=5000)
+
+            query = f"?near={CENTER_LAT},{CENTER_LNG}&radius_km={options['radius_km']}&ordering=distance"
+            timings = []
+            for _ in range(options['repeat']):
+                request = factory.get('/api/centers/' + query)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            self.stdout.write(
+                f"{options['count']} centers, radius {options['radius_km']} km, "
+                f"{response.data['count']} matches: "
+                f"median {timings[len(timings) // 2]:.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms"
+            )
+            transaction.set_rollback(True)
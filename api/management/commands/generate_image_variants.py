@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from api.models import Center, Section, SectionCategory
+from api.images import variants_are_stale
+from api.tasks import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = 'Generates WebP thumbnails for center, section and category images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--async', action='store_true', dest='use_celery',
+                            help='Enqueue generate_image_variants tasks instead of processing in this process')
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in (Center, Section, SectionCategory):
+            label = model._meta.label
+            instances = model.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants')
+            for instance in instances.iterator():
+                if not variants_are_stale(instance):
+                    continue
+                if options['use_celery']:
+                    generate_image_variants.delay(label, instance.id)
+                else:
+                    generate_image_variants(label, instance.id)
+                total += 1
+
+        action = 'Enqueued' if options['use_celery'] else 'Generated variants for'
+        self.stdout.write(self.style.SUCCESS(f'{action} {total} images'))
@@ -0,0 +1,45 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from api.models import Center
+from api.geocoding import geocode_address, get_geocoder, normalize_address
+from api.tasks import geocode_center
+
+
+class Command(BaseCommand):
+    help = 'Geocodes centers without coordinates (each distinct address is geocoded once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--async', action='store_true', dest='use_celery',
+                            help='Enqueue geocode_center tasks instead of geocoding in this process')
+
+    def handle(self, *args, **options):
+        centers = Center.objects.filter(latitude__isnull=True) | Center.objects.filter(longitude__isnull=True)
+
+        if options['use_celery']:
+            center_ids = list(centers.values_list('id', flat=True))
+            for center_id in center_ids:
+                geocode_center.delay(center_id)
+            self.stdout.write(self.style.SUCCESS(f'Enqueued {len(center_ids)} centers for geocoding'))
+            return
+
+        by_address = defaultdict(list)
+        for center in centers.only('id', 'location'):
+            by_address[normalize_address(center.location)].append(center)
+
+        geocoder = get_geocoder()
+        updated = failed = 0
+        for group in by_address.values():
+            coordinates = geocode_address(group[0].location, geocoder=geocoder)
+            if coordinates is None:
+                failed += len(group)
+                self.stdout.write(self.style.WARNING(f'Unable to geocode location: {group[0].location}'))
+                continue
+            for center in group:
+                center.latitude, center.longitude = coordinates
+                center.save(update_fields=['latitude', 'longitude'])
+                updated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Geocoded {updated} centers ({len(by_address)} distinct addresses), {failed} failed'
+        ))
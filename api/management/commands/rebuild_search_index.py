@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from api.models import Center, Section
+from api.search import create_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for centers and sections'
+
+    def handle(self, *args, **kwargs):
+        connection = connections[router.db_for_write(Center)]
+        create_search_indexes([Center, Section], connection, rebuild=True)
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt ({connection.vendor})'))
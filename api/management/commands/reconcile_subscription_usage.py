@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.subscriptions import reconcile_usage
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds subscription usage counters (booked, attended, canceled) from records. '
+        'Run once after the deploy that adds the counters, or whenever they drift'
+    )
+
+    def handle(self, *args, **kwargs):
+        fixed = reconcile_usage()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled usage counters for {fixed} subscriptions'))
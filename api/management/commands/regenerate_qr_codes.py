@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import Section
+from api.qr import render_qr_png, save_qr_png, section_qr_payload, stored_qr_name
+from api.caching import bump_model_version
+
+
+class Command(BaseCommand):
+    help = 'Generates missing section QR codes (or all of them with --all), rendering in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', dest='regenerate_all',
+                            help='Regenerate QR codes for every section, not only the missing ones')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of rendering processes')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        sections = Section.objects.only('id', 'qr_code').order_by('id')
+        if not options['regenerate_all']:
+            sections = sections.filter(qr_code__isnull=True) | sections.filter(qr_code='')
+
+        batch_size = max(options['batch_size'], 1)
+        updated = rendered = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            batch = []
+            for section in sections.iterator(chunk_size=batch_size):
+                batch.append(section)
+                if len(batch) >= batch_size:
+                    counts = self.process_batch(pool, batch)
+                    updated, rendered = updated + counts[0], rendered + counts[1]
+                    batch = []
+            if batch:
+                counts = self.process_batch(pool, batch)
+                updated, rendered = updated + counts[0], rendered + counts[1]
+
+        if updated:
+            bump_model_version(Section._meta.label)
+        self.stdout.write(self.style.SUCCESS(f'Updated QR codes for {updated} sections ({rendered} rendered)'))
+
+    def process_batch(self, pool, sections):
+        payloads = {section.id: section_qr_payload(section.id) for section in sections}
+        names = {section_id: stored_qr_name(payload) for section_id, payload in payloads.items()}
+
+        # Рендер — чистая CPU-работа, её отдаём пулу; запись в хранилище и БД — здесь
+        missing = [section_id for section_id, name in names.items() if name is None]
+        images = pool.map(render_qr_png, [payloads[section_id] for section_id in missing], chunksize=16)
+        for section_id, content in zip(missing, images):
+            names[section_id] = save_qr_png(payloads[section_id], content)
+
+        now = timezone.now()
+        changed = []
+        for section in sections:
+            if section.qr_code.name != names[section.id]:
+                section.qr_code = names[section.id]
+                section.updated_at = now
+                changed.append(section)
+        Section.objects.bulk_update(changed, ['qr_code', 'updated_at'])
+        return len(changed), len(missing)
@@ -0,0 +1,180 @@
+"""
+Отдача файлов из MEDIA_ROOT.
+
+Вью проверяет доступ (QR-коды видят только сотрудники центра и админы), а сами
+байты отдаёт фронтовой прокси по X-Accel-Redirect (nginx) или X-Sendfile
+(Apache/lighttpd), см. MEDIA_ACCEL в настройках. Без прокси файл отдаётся через
+FileResponse: WSGI-сервер с wsgi.file_wrapper (gunicorn) использует os.sendfile.
+
+Пример для nginx (MEDIA_ACCEL=nginx):
+
+    location /protected-media/ {
+        internal;
+        alias /path/to/media/;
+    }
+"""
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from user.authentication import CachedJWTAuthentication
+from .caching import is_not_modified
+from .models import Section
+from .permissions import get_staff_center_ids
+
+PROTECTED_MEDIA_PREFIXES = ('qrcodes/',)
+
+# Файлы с хэшем содержимого в имени (QR-коды, варианты картинок) не меняются
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{32}(_\w+)?\.\w+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def can_access(request, path):
+    if not path.startswith(PROTECTED_MEDIA_PREFIXES):
+        return True
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    if user.is_superuser or user.role == 'ADMIN':
+        return True
+    if user.role == 'STAFF':
+        return Section.objects.filter(qr_code=path, center_id__in=get_staff_center_ids(request)).exists()
+    return False
+
+
+def cache_control(path):
+    visibility = 'private' if path.startswith(PROTECTED_MEDIA_PREFIXES) else 'public'
+    if HASHED_NAME_RE.search(path):
+        return f'{visibility}, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'{visibility}, max-age={DEFAULT_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """(start, end) включительно для одного диапазона, None — отдать файл целиком, ValueError — 416."""
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        # Несколько диапазонов и прочие формы не поддерживаем — отдаём файл целиком
+        return None
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+class FileRange:
+    """Часть открытого файла; fileno() оставлен, чтобы сервер мог отдать её через sendfile."""
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def tell(self):
+        return self.fh.tell()
+
+    def close(self):
+        self.fh.close()
+
+
+@api_view(['GET', 'HEAD'])
+@authentication_classes([CachedJWTAuthentication, SessionAuthentication])
+@permission_classes([AllowAny])
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        return Response({'error': 'Файл не найден.'}, status=status.HTTP_404_NOT_FOUND)
+    # Дальше (проверка доступа, Cache-Control, X-Accel-Redirect) используем путь
+    # после нормализации: иначе center_images/../qrcodes/... обходит проверку
+    path = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+    if not os.path.isfile(full_path):
+        return Response({'error': 'Файл не найден.'}, status=status.HTTP_404_NOT_FOUND)
+    if not can_access(request, path):
+        return Response({'error': 'Нет доступа к файлу.'}, status=status.HTTP_403_FORBIDDEN)
+
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(path),
+    }
+    if is_not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    if settings.MEDIA_ACCEL == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path)
+    elif settings.MEDIA_ACCEL == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = file_response(request, full_path, stat.st_size, etag, content_type)
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def file_response(request, full_path, size, etag, content_type):
+    byte_range = None
+    range_header = request.headers.get('Range')
+    # If-Range: диапазон действителен, только если файл не менялся
+    if range_header and request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    fh = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(fh, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(fh, start, end - start + 1), content_type=content_type,
+                                status=status.HTTP_206_PARTIAL_CONTENT)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -1,4 +1,23 @@
 from rest_framework import permissions
+from .models import Center
+
+
+def get_staff_center_ids(request):
+    """
+    Возвращает id центров, закреплённых за пользователем с ролью STAFF.
+    Значение запоминается на объекте запроса, поэтому таблица связей
+    читается не более одного раза за запрос.
+    """
+    center_ids = getattr(request, '_staff_center_ids', None)
+    if center_ids is None:
+        center_ids = frozenset(
+            Center.users.through.objects
+            .filter(customuser_id=request.user.id)
+            .values_list('center_id', flat=True)
+        )
+        request._staff_center_ids = center_ids
+    return center_ids
+
 
 class IsStaffForCenter(permissions.BasePermission):
     """
@@ -10,12 +29,21 @@ class IsStaffForCenter(permissions.BasePermission):
             return True
 
         if request.user.role == 'STAFF':
-            return obj.center.users.filter(id=request.user.id).exists()
+            return obj.center_id in get_staff_center_ids(request)
 
         return False
 
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+class IsCenterStaffOrAdmin(BasePermission):
+    """
+    Доступ для сотрудников центров (STAFF) и администраторов.
+    Ограничение по конкретным центрам проверяет сама вью.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_superuser or user.role in ('STAFF', 'ADMIN')))
+
 class AllowAnyForGETOtherwiseIsAuthenticated(BasePermission):
     """
     Разрешает неаутентифицированный доступ для GET-запросов,
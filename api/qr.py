@@ -0,0 +1,59 @@
+"""
+QR-коды секций.
+
+Содержимое QR — компактный канонический JSON ({"section_id":1}). Картинки
+хранятся по адресу, зависящему от хэша содержимого, поэтому одинаковый QR
+рендерится один раз, а повторная генерация находит готовый файл в хранилище.
+"""
+import hashlib
+import io
+import json
+
+import qrcode
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+QR_UPLOAD_DIR = 'qrcodes'
+
+
+def section_qr_payload(section_id):
+    return json.dumps({'section_id': section_id}, separators=(',', ':'), sort_keys=True)
+
+
+def payload_hash(payload):
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def qr_file_name(payload):
+    return f'{QR_UPLOAD_DIR}/{payload_hash(payload)}.png'
+
+
+def render_qr_png(payload):
+    """PNG-картинка QR-кода. Без обращений к Django, можно вызывать в пуле процессов."""
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill='black', back_color='white')
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+def stored_qr_name(payload):
+    """Имя готового файла в хранилище или None, если QR ещё не рендерился."""
+    name = qr_file_name(payload)
+    return name if default_storage.exists(name) else None
+
+
+def save_qr_png(payload, content):
+    return default_storage.save(qr_file_name(payload), ContentFile(content))
+
+
+def ensure_qr_file(payload):
+    """Путь к PNG для payload; рендерит картинку только при промахе кэша."""
+    return stored_qr_name(payload) or save_qr_png(payload, render_qr_png(payload))
@@ -0,0 +1,201 @@
+"""
+Полнотекстовый поиск по каталогу (центры и секции).
+
+Как и обычный ?search= (icontains), находит каждое слово запроса как
+подстроку любого из полей, но через индекс:
+SQLite: FTS5-таблицы с триграммным токенизатором, синхронизируются сигналами
+post_save/post_delete.
+PostgreSQL: триграммный GIN-индекс по склеенным полям для поиска подстрок,
+GIN-индекс по to_tsvector('simple', ...) для ранжирования и триграммный
+индекс по name для названий с опечатками.
+Условие поиска добавляется к уже отфильтрованному queryset, поэтому права
+доступа и фильтры применяются в том же SQL-запросе.
+"""
+import operator
+import re
+import sqlite3
+from functools import reduce
+
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Модель -> индексируемые поля (те же, что search_fields во вьюсетах)
+SEARCH_FIELDS = {
+    'api.Center': ('name', 'location', 'description'),
+    'api.Section': ('name', 'description'),
+}
+
+# Триграммный токенизатор FTS5 появился в SQLite 3.34 и ищет подстроки от трёх символов
+SQLITE_TRIGRAM_VERSION = (3, 34, 0)
+MIN_TRIGRAM_LENGTH = 3
+
+
+def search_tokens(text):
+    return re.findall(r'\w+', text.casefold())
+
+
+def is_indexed(model):
+    return model._meta.label in SEARCH_FIELDS
+
+
+def _fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def _sqlite_trigram_supported():
+    return sqlite3.sqlite_version_info >= SQLITE_TRIGRAM_VERSION
+
+
+def _columns_sql(model, connection, table=None):
+    qn = connection.ops.quote_name
+    prefix = f'{qn(table)}.' if table else ''
+    return " || ' ' || ".join(f"coalesce({prefix}{qn(field)}, '')" for field in SEARCH_FIELDS[model._meta.label])
+
+
+def _tsvector_sql(model, connection, table=None):
+    return f"to_tsvector('simple', {_columns_sql(model, connection, table)})"
+
+
+def search_queryset(queryset, text):
+    """
+    queryset, оставляющий объекты, подходящие под запрос, с аннотацией
+    search_rank (чем меньше, тем релевантнее). None — СУБД без индекса.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite' and _sqlite_trigram_supported():
+        search = _sqlite_search
+    elif connection.vendor == 'postgresql':
+        search = _postgres_search
+    else:
+        return None
+    tokens = search_tokens(text)
+    if not tokens:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return search(queryset, tokens, text, connection)
+
+
+def _sqlite_search(queryset, tokens, text, connection):
+    model = queryset.model
+    qn = connection.ops.quote_name
+    table = qn(_fts_table(model))
+    fields = SEARCH_FIELDS[model._meta.label]
+
+    # Слова короче триграммы индекс не находит — для них обычный icontains
+    for token in tokens:
+        if len(token) < MIN_TRIGRAM_LENGTH:
+            queryset = queryset.filter(reduce(operator.or_, (Q(**{f'{field}__icontains': token}) for field in fields)))
+    long_tokens = [token for token in tokens if len(token) >= MIN_TRIGRAM_LENGTH]
+    if not long_tokens:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    # Фраза из одного слова в триграммной таблице — поиск подстроки
+    match = ' AND '.join(f'"{token}"' for token in long_tokens)
+    pk = f'{qn(model._meta.db_table)}.{qn(model._meta.pk.column)}'
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match]),
+    ).annotate(search_rank=RawSQL(
+        f'SELECT bm25({table}) FROM {table} WHERE {table} MATCH %s AND rowid = {pk}',
+        [match],
+        output_field=FloatField(),
+    ))
+
+
+def _postgres_search(queryset, tokens, text, connection):
+    model = queryset.model
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    columns = _columns_sql(model, connection, table)
+    vector = _tsvector_sql(model, connection, table)
+    name = f'{qn(table)}.{qn("name")}'
+    patterns = ['%' + token.replace('_', '\\_') + '%' for token in tokens]
+    substrings = ' AND '.join([f'({columns}) ILIKE %s'] * len(tokens))
+    query = ' & '.join(f'{token}:*' for token in tokens)
+    # Триграммы по name находят названия с опечатками
+    return queryset.filter(
+        RawSQL(f'({substrings}) OR {name} %% %s', [*patterns, text], output_field=BooleanField()),
+    ).annotate(search_rank=RawSQL(
+        f"-(ts_rank({vector}, to_tsquery('simple', %s)) + similarity({name}, %s))",
+        [query, text],
+        output_field=FloatField(),
+    ))
+
+
+def update_document(instance):
+    """Обновляет запись FTS5 для объекта (в PostgreSQL индекс обновляется сам)."""
+    model = type(instance)
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'sqlite':
+        return
+    fields = SEARCH_FIELDS[model._meta.label]
+    table = connection.ops.quote_name(_fts_table(model))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s{', %s' * len(fields)})",
+            [instance.pk, *(getattr(instance, field) or '' for field in fields)],
+        )
+
+
+def delete_document(instance):
+    model = type(instance)
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(_fts_table(model))} WHERE rowid = %s', [instance.pk])
+
+
+def create_search_indexes(models, connection, rebuild=False):
+    """Создаёт поисковые индексы; для SQLite заполняет пустые FTS5-таблицы."""
+    if connection.vendor == 'sqlite':
+        for model in models:
+            _create_sqlite_index(model, connection, rebuild)
+    elif connection.vendor == 'postgresql':
+        _create_postgres_indexes(models, connection)
+
+
+def _create_sqlite_index(model, connection, rebuild):
+    qn = connection.ops.quote_name
+    table = qn(_fts_table(model))
+    fields = SEARCH_FIELDS[model._meta.label]
+    columns = ', '.join(fields)
+    if not _sqlite_trigram_supported():
+        return
+    with connection.cursor() as cursor:
+        # Таблицы со старым токенизатором (поиск по префиксам слов) пересоздаются
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [_fts_table(model)])
+        row = cursor.fetchone()
+        if row and 'trigram' not in row[0]:
+            cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({columns}, tokenize="trigram")')
+        if rebuild:
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'SELECT 1 FROM {table} LIMIT 1')
+        if cursor.fetchone() is None:
+            source_columns = ', '.join(f"coalesce({qn(field)}, '')" for field in fields)
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, {columns}) '
+                f'SELECT id, {source_columns} FROM {qn(model._meta.db_table)}'
+            )
+
+
+def _create_postgres_indexes(models, connection):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        # Требует прав на создание расширений (или заранее установленный pg_trgm)
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for model in models:
+            table = model._meta.db_table
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {qn(table + '_search_gin')} "
+                f"ON {qn(table)} USING gin ({_tsvector_sql(model, connection)})"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {qn(table + '_search_trgm')} "
+                f"ON {qn(table)} USING gin (({_columns_sql(model, connection)}) gin_trgm_ops)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {qn(table + '_name_trgm')} "
+                f"ON {qn(table)} USING gin ({qn('name')} gin_trgm_ops)"
+            )
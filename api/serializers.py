@@ -4,22 +4,36 @@ from user.models import CustomUser
 from datetime import timedelta
 import calendar
 from django.utils import timezone
+from .images import variant_urls
 
-class CenterSerializer(serializers.ModelSerializer):
+class ImageVariantsMixin(serializers.Serializer):
+    # {'thumb': url, 'medium': url}; пусто, пока варианты ещё не созданы
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj, self.context.get('request'))
+
+class CenterSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     users = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all(), many=True, required=False)
+    distance = serializers.SerializerMethodField()
 
     class Meta:
         model = Center
-        fields = ['id', 'name', 'location', 'latitude', 'longitude', 'image', 'description', 'about', 'users']
+        fields = ['id', 'name', 'location', 'latitude', 'longitude', 'image', 'image_variants', 'description', 'about', 'users', 'distance']
+
+    def get_distance(self, obj):
+        # Заполняется только при поиске ?near=, в километрах
+        distance = getattr(obj, 'distance', None)
+        return round(distance, 3) if distance is not None else None
 
-class SectionSerializer(serializers.ModelSerializer):
+class SectionSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     center = serializers.PrimaryKeyRelatedField(queryset=Center.objects.all())
     qr_code = serializers.ImageField(read_only=True)
     weekly_pattern = serializers.JSONField()
 
     class Meta:
         model = Section
-        fields = ['id', 'name', 'category', 'image', 'center', 'description', 'qr_code', 'weekly_pattern']
+        fields = ['id', 'name', 'category', 'image', 'image_variants', 'center', 'description', 'qr_code', 'weekly_pattern']
 
     def create(self, validated_data):
         weekly_pattern = validated_data.pop('weekly_pattern', None)
@@ -83,11 +97,19 @@ class SectionSerializer(serializers.ModelSerializer):
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     freeze_days = serializers.IntegerField(write_only=True, required=False)
+    # Считается на момент запроса, а не из сохранённого флага is_active
+    is_active = serializers.SerializerMethodField()
 
     class Meta:
         model = Subscription
-        fields = ['id', 'name', 'user', 'type', 'start_date', 'end_date', 'is_active', 'is_activated_by_admin', 'is_frozen', 'frozen_start_date', 'frozen_end_date', 'freeze_days']
-        read_only_fields = ['user', 'start_date', 'end_date', 'is_active', 'is_frozen', 'frozen_start_date', 'frozen_end_date']
+        fields = ['id', 'name', 'user', 'type', 'start_date', 'end_date', 'is_active', 'is_activated_by_admin', 'is_frozen', 'frozen_start_date', 'frozen_end_date', 'freeze_days',
+                  'lesson_limit', 'lessons_booked', 'lessons_attended', 'lessons_canceled', 'lessons_remaining']
+        read_only_fields = ['user', 'start_date', 'end_date', 'is_active', 'is_frozen', 'frozen_start_date', 'frozen_end_date',
+                            'lesson_limit', 'lessons_booked', 'lessons_attended', 'lessons_canceled', 'lessons_remaining']
+
+    def get_is_active(self, obj):
+        currently_active = getattr(obj, 'currently_active', None)
+        return currently_active if currently_active is not None else obj.is_currently_active()
 
     def update(self, instance, validated_data):
         freeze_days = validated_data.pop('freeze_days', None)
@@ -153,8 +175,16 @@ class ScheduleSerializer(serializers.ModelSerializer):
                             )
             current_date += timedelta(days=1)
 
+class RecordScheduleSerializer(ScheduleSerializer):
+    section_name = serializers.CharField(source='section.name', read_only=True)
+    center = serializers.IntegerField(source='section.center_id', read_only=True)
+    center_name = serializers.CharField(source='section.center.name', read_only=True)
+
+    class Meta(ScheduleSerializer.Meta):
+        fields = ScheduleSerializer.Meta.fields + ['section_name', 'center', 'center_name']
+
 class RecordSerializer(serializers.ModelSerializer):
-    schedule = ScheduleSerializer(read_only=True)
+    schedule = RecordScheduleSerializer(read_only=True)
     subscription = SubscriptionSerializer(read_only=True)
 
     class Meta:
@@ -162,10 +192,10 @@ class RecordSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'schedule', 'attended', 'subscription', 'is_canceled']
         read_only_fields = ['user', 'attended', 'subscription']
 
-class SectionCategorySerializer(serializers.ModelSerializer):
+class SectionCategorySerializer(ImageVariantsMixin, serializers.ModelSerializer):
     class Meta:
         model = SectionCategory
-        fields = ['id', 'name', 'image']
+        fields = ['id', 'name', 'image', 'image_variants']
 
 class FeedbackSerializer(serializers.ModelSerializer):
     class Meta:
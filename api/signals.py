@@ -0,0 +1,137 @@
+from django.db import connections, transaction
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_migrate, post_save, post_delete
+from django.dispatch import receiver
+from user.authentication import bump_auth_version
+from .models import Center, Section, SectionCategory, Schedule, Subscription, Record
+from .clusters import invalidate_point
+from .tasks import geocode_center, generate_image_variants
+from .search import create_search_indexes, update_document, delete_document
+from . import autocomplete
+from .caching import bump_model_version
+from .sync import record_deletion
+from .images import variants_are_stale
+
+
+@receiver(m2m_changed, sender=Center.users.through)
+def invalidate_staff_principals(sender, instance, action, reverse, pk_set, **kwargs):
+    """Смена сотрудников центра меняет их набор центров в токене."""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if action != 'pre_clear':
+        # users входит в ответ API центра, поэтому двигаем и его updated_at (ETag)
+        center_ids = pk_set if reverse else {instance.pk}
+        if center_ids:
+            Center.objects.filter(pk__in=center_ids).update(updated_at=timezone.now())
+        transaction.on_commit(lambda: bump_model_version(Center._meta.label))
+    if reverse:
+        bump_auth_version(instance.pk)
+    elif action == 'pre_clear':
+        instance._cleared_user_ids = list(instance.users.values_list('id', flat=True))
+    else:
+        user_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_user_ids', [])
+        for user_id in user_ids:
+            bump_auth_version(user_id)
+
+
+@receiver(post_save, sender=Center)
+def invalidate_center_tiles(sender, instance, **kwargs):
+    """Кластеры на карте зависят только от координат центра."""
+    old = getattr(instance, '_loaded_coordinates', (None, None))
+    new = (instance.latitude, instance.longitude)
+    if old != new:
+        invalidate_point(*old)
+        invalidate_point(*new)
+        instance._loaded_coordinates = new
+
+
+@receiver(post_save, sender=Center)
+def schedule_center_geocoding(sender, instance, **kwargs):
+    if instance.latitude is None or instance.longitude is None:
+        transaction.on_commit(lambda: geocode_center.delay(instance.pk))
+
+
+@receiver(post_delete, sender=Center)
+def invalidate_deleted_center_tiles(sender, instance, **kwargs):
+    invalidate_point(instance.latitude, instance.longitude)
+
+
+@receiver(post_migrate)
+def create_postgres_indexes(sender, using, **kwargs):
+    """
+    Индексы, которые есть только в PostgreSQL. BRIN по Schedule.date
+    почти ничего не весит: расписание добавляется в порядке дат.
+    """
+    connection = connections[using]
+    if sender.label != 'api' or connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {qn('api_schedule_date_brin')} "
+            f"ON {qn(Schedule._meta.db_table)} USING brin ({qn('date')})"
+        )
+
+
+@receiver(post_migrate)
+def create_catalog_search_indexes(sender, using, **kwargs):
+    if sender.label == 'api':
+        create_search_indexes([Center, Section], connections[using])
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_save, sender=Section)
+def update_search_document(sender, instance, **kwargs):
+    update_document(instance)
+
+
+@receiver(post_delete, sender=Center)
+@receiver(post_delete, sender=Section)
+def delete_search_document(sender, instance, **kwargs):
+    delete_document(instance)
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=SectionCategory)
+def update_autocomplete_entry(sender, instance, **kwargs):
+    type_name, pk, name = autocomplete.object_type(instance), instance.pk, instance.name
+    transaction.on_commit(lambda: autocomplete.update_entry(type_name, pk, name))
+
+
+@receiver(post_delete, sender=Center)
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=SectionCategory)
+def delete_autocomplete_entry(sender, instance, **kwargs):
+    # pk нужно запомнить сейчас: после удаления Django обнуляет его у объекта
+    type_name, pk = autocomplete.object_type(instance), instance.pk
+    transaction.on_commit(lambda: autocomplete.update_entry(type_name, pk))
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=SectionCategory)
+@receiver(post_delete, sender=Center)
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=SectionCategory)
+def bump_catalog_version(sender, instance, **kwargs):
+    # После коммита: иначе параллельный запрос может закэшировать старые данные под новой версией
+    transaction.on_commit(lambda: bump_model_version(sender._meta.label))
+
+
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=Record)
+def record_sync_tombstone(sender, instance, **kwargs):
+    """Удаления, в том числе каскадные, попадают в дельта-синхронизацию."""
+    record_deletion(instance)
+
+
+@receiver(post_save, sender=Center)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=SectionCategory)
+def schedule_image_variants(sender, instance, **kwargs):
+    if variants_are_stale(instance):
+        label, pk = sender._meta.label, instance.pk
+        transaction.on_commit(lambda: generate_image_variants.delay(label, pk))
@@ -0,0 +1,76 @@
+"""
+Массовое обслуживание подписок: истечение срока и автоматическая разморозка.
+
+Каждый шаг — один UPDATE по индексу, без загрузки объектов в Python,
+поэтому save()/сигналы не вызываются и updated_at проставляется явно.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Record, Subscription
+
+
+def unfreeze_due(now):
+    """
+    Размораживает подписки с истёкшей заморозкой. Остаток дней отсчитывается
+    от frozen_end_date (момента окончания заморозки), а не от времени запуска.
+    """
+    new_end_date = F('frozen_end_date') + ExpressionWrapper(
+        F('remaining_days') * Value(timedelta(days=1)), output_field=DurationField()
+    )
+    return Subscription.objects.filter(is_frozen=True, frozen_end_date__lte=now).update(
+        is_frozen=False,
+        is_active=True,
+        end_date=new_end_date,
+        frozen_start_date=None,
+        frozen_end_date=None,
+        remaining_days=0,
+        updated_at=now,
+    )
+
+
+def expire_due(now):
+    return Subscription.objects.filter(is_active=True, is_frozen=False, end_date__lte=now).update(
+        is_active=False,
+        updated_at=now,
+    )
+
+
+def sweep_subscriptions(now=None):
+    """Возвращает (число размороженных, число истёкших)."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Сначала разморозка: подписка, у которой после неё не осталось дней, сразу истечёт
+        unfrozen = unfreeze_due(now)
+        expired = expire_due(now)
+    return unfrozen, expired
+
+
+def record_count(**filters):
+    records = (
+        Record.objects.filter(subscription=OuterRef('pk'), **filters)
+        .order_by().values('subscription').annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(Subquery(records), 0)
+
+
+def reconcile_usage(using='default'):
+    """
+    Пересчитывает счётчики использования по записям. Один UPDATE с
+    коррелированными подзапросами, затрагивает только разошедшиеся строки.
+    """
+    drifted = (
+        Subscription.objects.using(using)
+        .annotate(booked=record_count(), attended=record_count(attended=True), canceled=record_count(is_canceled=True))
+        .filter(~Q(lessons_booked=F('booked')) | ~Q(lessons_attended=F('attended')) | ~Q(lessons_canceled=F('canceled')))
+    )
+    return drifted.update(
+        lessons_booked=record_count(),
+        lessons_attended=record_count(attended=True),
+        lessons_canceled=record_count(is_canceled=True),
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,92 @@
+"""
+Дельта-синхронизация для мобильного приложения.
+
+Токен — момент времени в микросекундах. Изменённые объекты находятся по
+updated_at, удалённые — по записям Tombstone. Токен выдаётся с запасом
+SYNC_SETTLE_SECONDS назад, чтобы не потерять строки из транзакций, которые
+ещё не были закоммичены в момент запроса (повторная отдача строки безопасна).
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import Record, Schedule, Section, Subscription, Tombstone
+from .permissions import get_staff_center_ids
+from .serializers import RecordSerializer, ScheduleSerializer, SectionSerializer, SubscriptionSerializer
+
+SYNC_SETTLE_SECONDS = 2
+# Если изменений больше, клиенту дешевле заново загрузить списки целиком
+SYNC_MAX_CHANGES = 500
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Модель -> вид записи в Tombstone и признак личного объекта (owner_id = user_id)
+TRACKED_MODELS = {
+    Section: ('section', False),
+    Schedule: ('schedule', False),
+    Subscription: ('subscription', True),
+    Record: ('record', True),
+}
+
+
+def encode_token(moment):
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def decode_token(token):
+    return EPOCH + timedelta(microseconds=int(token))
+
+
+def current_token():
+    return encode_token(timezone.now() - timedelta(seconds=SYNC_SETTLE_SECONDS))
+
+
+def _sources(request):
+    user = request.user
+    sections = Section.objects.all()
+    schedules = Schedule.objects.all()
+    if user.role == 'STAFF':
+        center_ids = get_staff_center_ids(request)
+        sections = sections.filter(center_id__in=center_ids)
+        schedules = schedules.filter(section__center_id__in=center_ids)
+    return [
+        ('sections', sections, SectionSerializer),
+        ('schedules', schedules, ScheduleSerializer),
+        ('subscriptions', Subscription.objects.filter(user=user), SubscriptionSerializer),
+        ('records', Record.objects.select_related('schedule__section__center', 'subscription').filter(user=user), RecordSerializer),
+    ]
+
+
+def collect_changes(request, since):
+    """
+    Изменения с момента since по всем отслеживаемым моделям
+    или None, если клиенту нужно выполнить полную загрузку.
+    """
+    if since < timezone.now() - TOMBSTONE_RETENTION:
+        return None
+
+    changes = {}
+    for key, queryset, serializer_class in _sources(request):
+        kind, owned = TRACKED_MODELS[queryset.model]
+        updated = list(queryset.filter(updated_at__gt=since).order_by('updated_at', 'id')[:SYNC_MAX_CHANGES + 1])
+        tombstones = Tombstone.objects.filter(kind=kind, deleted_at__gt=since)
+        if owned:
+            tombstones = tombstones.filter(owner_id=request.user.id)
+        deleted = list(tombstones.values_list('object_id', flat=True)[:SYNC_MAX_CHANGES + 1])
+        if len(updated) > SYNC_MAX_CHANGES or len(deleted) > SYNC_MAX_CHANGES:
+            return None
+        changes[key] = {
+            'updated': serializer_class(updated, many=True, context={'request': request}).data,
+            'deleted': deleted,
+        }
+    return changes
+
+
+def record_deletion(instance):
+    kind, owned = TRACKED_MODELS[type(instance)]
+    Tombstone.objects.create(kind=kind, object_id=instance.pk, owner_id=instance.user_id if owned else None)
+
+
+def prune_tombstones():
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()[0]
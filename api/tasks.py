@@ -2,7 +2,14 @@ from celery import shared_task
 from django.utils import timezone
 from twilio.rest import Client
 from user.models import CustomUser
-from api.models import Schedule, Record
+from api.models import Schedule, Record, Center, Section
+from api.qr import ensure_qr_file, section_qr_payload
+from api.images import build_variants
+from django.apps import apps
+from api.caching import bump_model_version
+from api.geocoding import geocode_address
+from geopy.exc import GeocoderServiceError
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta, datetime
 
 
@@ -80,3 +87,75 @@ def notify_user_after_recording(record_id):
             print(f"Уведомление отправлено пользователю {user.phone_number} для записи на урок {schedule.section.name}")
         except Exception as e:
             print(f"Ошибка при отправке сообщения на {user.phone_number}: {str(e)}")
+
+
+@shared_task(autoretry_for=(GeocoderServiceError,), retry_backoff=True, max_retries=5)
+def geocode_center(center_id):
+    """Заполнить координаты центра по адресу (с кэшем геокодирования)."""
+    center = Center.objects.filter(id=center_id).first()
+    if center is None or (center.latitude is not None and center.longitude is not None):
+        return
+
+    try:
+        coordinates = geocode_address(center.location)
+    except ImproperlyConfigured as exc:
+        # Без ключа геокодер не работает; сохранение центра при этом не должно падать
+        print(f"Геокодирование отключено: {exc}")
+        return
+    if coordinates is None:
+        print(f"Не удалось определить координаты для адреса: {center.location}")
+        return
+
+    center.latitude, center.longitude = coordinates
+    center.save(update_fields=['latitude', 'longitude'])
+
+
+@shared_task
+def generate_section_qr(section_id, force=False):
+    """Сгенерировать QR-код секции (картинка берётся из кэша по хэшу содержимого)."""
+    section = Section.objects.filter(id=section_id).only('id', 'qr_code').first()
+    if section is None or (section.qr_code and not force):
+        return
+
+    name = ensure_qr_file(section_qr_payload(section.id))
+    if section.qr_code.name != name:
+        # update() вместо save(): save() секции пересоздаёт расписание
+        Section.objects.filter(id=section.id).update(qr_code=name, updated_at=timezone.now())
+        bump_model_version(Section._meta.label)
+
+
+@shared_task
+def generate_image_variants(model_label, object_id):
+    """Создать WebP-варианты картинки центра, секции или категории."""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(id=object_id).only('id', 'image', 'image_variants').first()
+    if instance is None:
+        return
+
+    if instance.image:
+        # Условие по image: пока шла обработка, картинку могли заменить
+        queryset = model.objects.filter(id=object_id, image=instance.image.name)
+        variants = build_variants(instance.image)
+    else:
+        queryset = model.objects.filter(id=object_id)
+        variants = {}
+    updated = queryset.update(image_variants=variants, updated_at=timezone.now())
+    if updated:
+        bump_model_version(model_label)
+
+
+@shared_task
+def sweep_subscriptions():
+    """Разморозить подписки с истёкшей заморозкой и деактивировать истёкшие."""
+    from api.subscriptions import sweep_subscriptions as sweep
+    unfrozen, expired = sweep()
+    print(f"Разморожено подписок: {unfrozen}, деактивировано истёкших: {expired}")
+    return {'unfrozen': unfrozen, 'expired': expired}
+
+
+@shared_task
+def prune_sync_tombstones():
+    """Удалить записи об удалениях старше срока хранения дельта-синхронизации."""
+    from api.sync import prune_tombstones
+    deleted = prune_tombstones()
+    print(f"Удалено устаревших записей синхронизации: {deleted}")
@@ -0,0 +1,251 @@
+from datetime import time, timedelta
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.db_router import PRIMARY_DB, REPLICA_DB, ReplicaRoutingMiddleware, replica_configured, use_primary
+from user.models import CustomUser
+from . import sync
+from .checkin import CheckinTokenError, make_checkin_token, set_attendance, verify_checkin_token
+from .models import Center, Record, Schedule, Section, SectionCategory, Subscription, Tombstone
+
+
+@skipUnless(replica_configured(), 'Нужна реплика: DATABASE_REPLICA_URL=sqlite:///replica.sqlite3')
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    # TestCase держит транзакцию на основной БД, а внутри неё роутер не читает с реплики
+    databases = '__all__'
+
+    def run_request(self, method, view):
+        """Выполняет view внутри ReplicaRoutingMiddleware и возвращает её результат."""
+        result = {}
+
+        def get_response(request):
+            result['value'] = view()
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        ReplicaRoutingMiddleware(get_response)(request)
+        return result['value']
+
+    def create_center(self):
+        return Center.objects.create(name='Центр', location='Алматы')
+
+    def test_safe_request_reads_from_replica(self):
+        self.create_center()
+
+        def view():
+            queryset = Center.objects.all()
+            return queryset.db, len(queryset)
+
+        self.assertEqual(self.run_request('get', view), (REPLICA_DB, 1))
+
+    def test_unsafe_request_reads_from_primary(self):
+        self.assertEqual(self.run_request('post', lambda: Center.objects.all().db), PRIMARY_DB)
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.run_request('get', lambda: router.db_for_write(Center)), PRIMARY_DB)
+        center = self.run_request('get', self.create_center)
+        self.assertEqual(center._state.db, PRIMARY_DB)
+
+    def test_select_for_update_goes_to_primary(self):
+        self.assertEqual(self.run_request('get', lambda: Center.objects.select_for_update().db), PRIMARY_DB)
+
+    def test_request_sticks_to_primary_after_write(self):
+        def view():
+            before = Center.objects.all().db
+            self.create_center()
+            return before, Center.objects.all().db
+
+        self.assertEqual(self.run_request('get', view), (REPLICA_DB, PRIMARY_DB))
+        # Следующий запрос снова читает с реплики
+        self.assertEqual(self.run_request('get', lambda: Center.objects.all().db), REPLICA_DB)
+
+    def test_use_primary_block(self):
+        def view():
+            with use_primary():
+                return Center.objects.all().db
+
+        self.assertEqual(self.run_request('get', view), PRIMARY_DB)
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(Center.objects.all().db, PRIMARY_DB)
+
+
+class CatalogFixtureMixin:
+    """Центр, секция, идущее сегодня занятие и пользователь с активным абонементом."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='pass', first_name='Айдар', last_name='Серіков')
+        self.center = Center.objects.create(name='Центр', location='Алматы')
+        category = SectionCategory.objects.create(name='Футбол')
+        self.section = Section.objects.create(name='Футбол', category=category, center=self.center)
+        # С начала текущего часа до конца дня: запись открыта, QR-токен ещё действует
+        start = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+        self.schedule = Schedule.objects.create(
+            section=self.section, date=start.date(), start_time=start.time(), end_time=time(23, 59, 59), capacity=10,
+        )
+        self.subscription = Subscription.objects.create(user=self.user, is_activated_by_admin=True, lesson_limit=2)
+
+    def create_record(self, **kwargs):
+        return Record.objects.create(user=self.user, schedule=self.schedule, subscription=self.subscription, **kwargs)
+
+    def refresh_subscription(self):
+        self.subscription.refresh_from_db()
+        return self.subscription
+
+
+class ReserveLessonTests(CatalogFixtureMixin, TestCase):
+    def test_limit_is_enforced(self):
+        self.assertTrue(self.subscription.reserve_lesson())
+        self.assertTrue(self.subscription.reserve_lesson())
+        self.assertFalse(self.subscription.reserve_lesson())
+        self.assertEqual(self.refresh_subscription().lessons_booked, 2)
+        self.assertEqual(self.subscription.lessons_remaining, 0)
+
+    def test_canceled_lessons_return_quota(self):
+        self.assertTrue(self.subscription.reserve_lesson())
+        self.assertTrue(self.subscription.reserve_lesson())
+        Subscription.add_usage(self.subscription.pk, canceled=1)
+        self.assertTrue(self.subscription.reserve_lesson())
+        self.assertEqual(self.refresh_subscription().lessons_booked, 3)
+
+    def test_no_limit(self):
+        Subscription.objects.filter(pk=self.subscription.pk).update(lesson_limit=None)
+        for _ in range(5):
+            self.assertTrue(self.subscription.reserve_lesson())
+        self.assertIsNone(self.refresh_subscription().lessons_remaining)
+
+    def test_save_keeps_counters(self):
+        self.subscription.reserve_lesson()
+        self.subscription.name = 'Абонемент'
+        self.subscription.save()
+        self.assertEqual(self.refresh_subscription().lessons_booked, 1)
+
+    def test_booking_endpoint_rejects_when_limit_is_reached(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        Subscription.objects.filter(pk=self.subscription.pk).update(lessons_booked=2)
+        response = client.post('/api/records/', {'schedule': self.schedule.pk, 'subscription': self.subscription.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Лимит занятий по абонементу исчерпан.'})
+        self.assertFalse(Record.objects.exists())
+
+        Subscription.objects.filter(pk=self.subscription.pk).update(lessons_booked=1)
+        response = client.post('/api/records/', {'schedule': self.schedule.pk, 'subscription': self.subscription.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.refresh_subscription().lessons_booked, 2)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.reserved, 1)
+
+
+class CheckinTests(CatalogFixtureMixin, TestCase):
+    def test_token_round_trip(self):
+        record = self.create_record()
+        token, expires_at = make_checkin_token(record)
+        self.assertEqual(verify_checkin_token(token), {
+            'record_id': record.pk, 'schedule_id': self.schedule.pk,
+            'center_id': self.center.pk, 'user_id': self.user.pk,
+        })
+        with self.assertRaises(CheckinTokenError) as error:
+            verify_checkin_token(token, now=expires_at + timedelta(seconds=1))
+        self.assertEqual(error.exception.status, 'expired')
+
+    def test_tampered_token_is_invalid(self):
+        token, _ = make_checkin_token(self.create_record())
+        record_id, rest = token.split(':', 1)
+        for bad in (f'{int(record_id) + 1}:{rest}', token[:-1], 'garbage'):
+            with self.assertRaises(CheckinTokenError) as error:
+                verify_checkin_token(bad)
+            self.assertEqual(error.exception.status, 'invalid')
+
+    def test_set_attendance_statuses_and_counters(self):
+        first, second = self.create_record(), self.create_record()
+        canceled = self.create_record(is_canceled=True)
+        statuses = set_attendance(Record.objects.all(), [first.pk, second.pk, canceled.pk, 10**6])
+        self.assertEqual(statuses, {first.pk: 'updated', second.pk: 'updated', canceled.pk: 'canceled', 10**6: 'not_found'})
+        self.assertEqual(self.refresh_subscription().lessons_attended, 2)
+
+        statuses = set_attendance(Record.objects.all(), [first.pk])
+        self.assertEqual(statuses, {first.pk: 'unchanged'})
+        self.assertEqual(self.refresh_subscription().lessons_attended, 2)
+
+        statuses = set_attendance(Record.objects.all(), [first.pk], attended=False)
+        self.assertEqual(statuses, {first.pk: 'updated'})
+        self.assertEqual(self.refresh_subscription().lessons_attended, 1)
+
+    def test_set_attendance_respects_scope(self):
+        record = self.create_record()
+        statuses = set_attendance(Record.objects.exclude(pk=record.pk), [record.pk])
+        self.assertEqual(statuses, {record.pk: 'not_found'})
+        record.refresh_from_db()
+        self.assertFalse(record.attended)
+
+    def test_unmark_does_not_go_below_zero(self):
+        # Посещение отмечено в обход счётчиков (например, через админку)
+        record = self.create_record(attended=True)
+        set_attendance(Record.objects.all(), [record.pk], attended=False)
+        self.assertEqual(self.refresh_subscription().lessons_attended, 0)
+
+    def test_scan_endpoint(self):
+        staff = CustomUser.objects.create_user(email='staff@example.com', password='pass', role='STAFF', first_name='A', last_name='B')
+        self.center.users.add(staff)
+        record = self.create_record()
+        token, _ = make_checkin_token(record)
+        client = APIClient()
+        client.force_authenticate(staff)
+        response = client.post('/api/attendance/scan/', {'tokens': [token, token, 'garbage']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checked_in'], 1)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['checked_in', 'duplicate', 'invalid'])
+        self.assertEqual(self.refresh_subscription().lessons_attended, 1)
+
+
+class SyncTombstoneTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.since = sync.encode_token(timezone.now() - timedelta(minutes=1))
+
+    def get_changes(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since or self.since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deleted_record_is_reported_to_its_owner(self):
+        record = self.create_record()
+        record_id = record.pk
+        record.delete()
+        self.assertEqual(self.get_changes()['records']['deleted'], [record_id])
+
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass', first_name='A', last_name='B')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.get_changes()['records']['deleted'], [])
+
+    def test_cascade_deletes_leave_tombstones(self):
+        record = self.create_record()
+        ids = {'sections': self.section.pk, 'schedules': self.schedule.pk, 'records': record.pk}
+        self.section.delete()
+        changes = self.get_changes()
+        for key, object_id in ids.items():
+            self.assertEqual(changes[key]['deleted'], [object_id])
+
+    def test_tombstones_before_since_are_skipped(self):
+        self.create_record().delete()
+        self.assertEqual(self.get_changes(sync.encode_token(timezone.now()))['records']['deleted'], [])
+
+    def test_old_token_requires_reset(self):
+        since = sync.encode_token(timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1))
+        self.assertTrue(self.get_changes(since)['reset'])
+
+    def test_prune_removes_expired_tombstones(self):
+        self.create_record().delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1))
+        self.assertEqual(sync.prune_tombstones(), 1)
+        self.assertFalse(Tombstone.objects.exists())
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CenterViewSet, SectionViewSet, SubscriptionViewSet, ScheduleViewSet, RecordViewSet, SectionCategoryViewSet, FeedbackViewSet, dashboard_metrics, dashboard_notifications, recent_activities
+from .views import CenterViewSet, SectionViewSet, SubscriptionViewSet, ScheduleViewSet, RecordViewSet, SectionCategoryViewSet, FeedbackViewSet, dashboard_metrics, dashboard_notifications, recent_activities, autocomplete_names, sync_changes
 
 router = DefaultRouter()
 router.register(r'centers', CenterViewSet)
@@ -15,9 +15,12 @@ urlpatterns = [
     path('', include(router.urls)),
     path('attendance/', RecordViewSet.as_view({'post': 'confirm_attendance'})),
     path('attendance/cancel/', RecordViewSet.as_view({'post': 'cancel_reservation'})), 
+    path('attendance/scan/', RecordViewSet.as_view({'post': 'scan_checkins'}, **RecordViewSet.scan_checkins.kwargs), name='attendance-scan'),
     path('dashboard/metrics/', dashboard_metrics, name='dashboard-metrics'),
     path('dashboard/recent-activities/', recent_activities, name='recent-activities'),
     path('dashboard/notifications/', dashboard_notifications, name='dashboard-notifications'),
+    path('autocomplete/', autocomplete_names, name='autocomplete'),
+    path('sync/', sync_changes, name='sync'),
     path('subscriptions/unactivated/', SubscriptionViewSet.as_view({'get': 'unactivated_subscriptions'})),
     path('subscriptions/<int:pk>/activate/', SubscriptionViewSet.as_view({'post': 'activate_subscription'})),
     path('subscriptions/<int:pk>/freeze/', SubscriptionViewSet.as_view({'post': 'freeze'}), name='subscription-freeze'),
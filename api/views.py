@@ -10,15 +10,23 @@ from django.utils import timezone
 from datetime import timedelta, datetime
 from rest_framework.exceptions import ValidationError
 from .tasks import notify_user_after_recording
-from .permissions import AllowAnyForGETOtherwiseIsAuthenticated  
-from django.db import transaction
-from .filters import CenterFilter, SectionFilter
-
-class CenterViewSet(viewsets.ModelViewSet):
+from .permissions import AllowAnyForGETOtherwiseIsAuthenticated, IsCenterStaffOrAdmin, get_staff_center_ids
+from django.db import IntegrityError, transaction
+from .filters import CenterFilter, SectionFilter, SubscriptionFilter, CenterOrderingFilter, IndexedSearchFilter
+from .geo import MAX_TILE_ZOOM, tiles_for_bbox
+from .clusters import get_clusters
+from .caching import CachedResponseMixin, ConditionalGetMixin
+from .checkin import CheckinTokenError, MAX_CHECKIN_BATCH, apply_checkins, make_checkin_token, set_attendance, verify_checkin_token
+from core.throttling import UserRateThrottle
+
+MAX_CLUSTER_TILES = 64
+
+class CenterViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Center.objects.all()
+    cache_models = ('api.Center',)
     serializer_class = CenterSerializer
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, CenterOrderingFilter]
     permission_classes = [AllowAnyForGETOtherwiseIsAuthenticated] 
     filterset_class = CenterFilter  
     search_fields = ['name', 'location', 'description']  
@@ -30,7 +38,7 @@ class CenterViewSet(viewsets.ModelViewSet):
     'users': ['icontains'],
 }
 
-    ordering_fields = ['name_icontains', 'location', 'latitude', 'longitude']
+    ordering_fields = ['name_icontains', 'location', 'latitude', 'longitude', 'distance']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -53,17 +61,37 @@ class CenterViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         if self.request.user.role == 'STAFF':
-            center = self.get_object()
-            if not center.users.filter(id=self.request.user.id).exists():
+            if serializer.instance.pk not in get_staff_center_ids(self.request):
                 raise ValidationError("У вас нет прав для редактирования этого центра.")
         serializer.save()
 
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        Кластеры центров для карты: ?bbox=min_lng,min_lat,max_lng,max_lat&zoom=10
+        """
+        try:
+            min_lng, min_lat, max_lng, max_lat = (float(part) for part in request.query_params['bbox'].split(','))
+            zoom = int(request.query_params['zoom'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Требуются параметры bbox=min_lng,min_lat,max_lng,max_lat и zoom.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 0 <= zoom <= MAX_TILE_ZOOM or min_lat > max_lat or min_lng > max_lng:
+            return Response({'error': 'Некорректные bbox или zoom.'}, status=status.HTTP_400_BAD_REQUEST)
 
-class SectionViewSet(viewsets.ModelViewSet):
+        tiles = tiles_for_bbox(min_lat, max_lat, min_lng, max_lng, zoom)
+        if len(tiles) > MAX_CLUSTER_TILES:
+            return Response({'error': 'Слишком большая область для этого zoom.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'zoom': zoom, 'clusters': get_clusters(tiles)}, status=status.HTTP_200_OK)
+
+
+class SectionViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Section.objects.all()
+    cache_models = ('api.Section',)
     serializer_class = SectionSerializer
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     permission_classes = [AllowAnyForGETOtherwiseIsAuthenticated]  
     filterset_class = SectionFilter
     
@@ -75,7 +103,7 @@ class SectionViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
 
         if self.request.user.is_authenticated and self.request.user.role == 'STAFF':
-            queryset = queryset.filter(center__users=self.request.user)
+            queryset = queryset.filter(center_id__in=get_staff_center_ids(self.request))
 
         new_param = self.request.query_params.get('new', None)
         if new_param is not None:
@@ -88,15 +116,21 @@ class SectionViewSet(viewsets.ModelViewSet):
                 raise ValidationError('Параметр "new" должен быть целым числом.')
         return queryset
 
+    def get_cache_scope(self, request):
+        # STAFF видит только секции своих центров
+        if request.user.is_authenticated and request.user.role == 'STAFF':
+            return 'staff:' + ','.join(map(str, sorted(get_staff_center_ids(request))))
+        return 'public'
+
     def perform_update(self, serializer):
         if self.request.user.role == 'STAFF':
-            section = self.get_object()
-            if not section.center.users.filter(id=self.request.user.id).exists():
+            if serializer.instance.center_id not in get_staff_center_ids(self.request):
                 raise ValidationError("У вас нет прав для редактирования этого раздела.")
         serializer.save()
 
-class SectionCategoryViewSet(viewsets.ModelViewSet):
+class SectionCategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = SectionCategory.objects.all()
+    cache_models = ('api.SectionCategory',)
     serializer_class = SectionCategorySerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = [AllowAnyForGETOtherwiseIsAuthenticated]  # Применяем новое разрешение
@@ -108,13 +142,14 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['type', 'is_active']
+    filterset_class = SubscriptionFilter
     ordering_fields = ['start_date', 'end_date']
 
     def get_queryset(self):
+        queryset = Subscription.objects.with_currently_active()
         if self.request.user.role == 'ADMIN':
-            return Subscription.objects.all()
-        return Subscription.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -134,6 +169,8 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         if instance.end_date < timezone.now():
             instance.is_active = False
             instance.save()
+        # Аннотация из get_queryset посчитана до изменений
+        instance.currently_active = instance.is_currently_active()
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def unactivated_subscriptions(self, request):
@@ -181,7 +218,7 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
 
         return Response({'message': 'Абонемент успешно активирован.'}, status=status.HTTP_200_OK)
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+class ScheduleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Schedule.objects.all()
     serializer_class = ScheduleSerializer
     pagination_class = StandardResultsSetPagination
@@ -246,15 +283,76 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
+    def get_cache_scope(self, request):
+        if request.user.role == 'STAFF':
+            return 'staff:' + ','.join(map(str, sorted(get_staff_center_ids(request))))
+        return request.user.role
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsCenterStaffOrAdmin])
+    def roster(self, request, pk=None):
+        """Все записавшиеся на занятие с контактами — одним запросом с JOIN на пользователей."""
+        schedule = self.get_object()
+        attendees = (
+            Record.objects.filter(schedule=schedule)
+            .order_by('user__last_name', 'user__first_name', 'id')
+            .values(
+                'id', 'attended', 'is_canceled', 'user_id',
+                'user__first_name', 'user__last_name', 'user__phone_number', 'user__email',
+            )
+        )
+        return Response({
+            'schedule': schedule.id,
+            'capacity': schedule.capacity,
+            'reserved': schedule.reserved,
+            'attendees': [{
+                'record_id': row['id'],
+                'user_id': row['user_id'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+                'phone_number': row['user__phone_number'],
+                'email': row['user__email'],
+                'attended': row['attended'],
+                'is_canceled': row['is_canceled'],
+            } for row in attendees],
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsCenterStaffOrAdmin])
+    def mark_attendance(self, request, pk=None):
+        """Отметка посещения списком: {"record_ids": [...], "attended": true}."""
+        # Доступ STAFF к центру проверяется один раз — через get_queryset при поиске занятия
+        schedule = self.get_object()
+        record_ids = request.data.get('record_ids')
+        attended = request.data.get('attended', True)
+        if not isinstance(record_ids, list) or not record_ids:
+            return Response({'error': 'Требуется список идентификаторов записей.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(record_ids) > MAX_CHECKIN_BATCH:
+            return Response({'error': f'Не больше {MAX_CHECKIN_BATCH} записей за запрос.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(attended, bool):
+            return Response({'error': 'Параметр "attended" должен быть true или false.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            record_ids = [int(record_id) for record_id in record_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'Идентификаторы записей должны быть целыми числами.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            statuses = set_attendance(Record.objects.filter(schedule=schedule), record_ids, attended)
+        except IntegrityError:
+            return Response({'error': 'Не удалось сохранить отметки посещения.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'updated': sum(value == 'updated' for value in statuses.values()),
+            'results': [{'record_id': record_id, 'status': value} for record_id, value in statuses.items()],
+        }, status=status.HTTP_200_OK)
+
     def get_queryset(self):
         if self.request.user.role == 'STAFF':
-            return Schedule.objects.filter(section__center__users=self.request.user)
+            return Schedule.objects.filter(section__center_id__in=get_staff_center_ids(self.request))
         elif self.request.user.role == 'ADMIN':
             return Schedule.objects.all()
         return super().get_queryset()
 
 class RecordViewSet(viewsets.ModelViewSet):
-    queryset = Record.objects.all()
+    # Связи, которые нужны RecordSerializer (расписание, секция, центр, абонемент)
+    queryset = Record.objects.select_related('schedule__section__center', 'subscription')
     serializer_class = RecordSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
@@ -262,11 +360,18 @@ class RecordViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user', 'schedule', 'attended', 'subscription', 'schedule__section', 'schedule__date']
     search_fields = ['schedule__section__name', 'user__email']
     ordering_fields = ['schedule__start_time', 'attended', 'schedule__date']
+    throttle_scope = 'booking'
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         if self.request.user.role == 'ADMIN':
-            return Record.objects.all()
-        return Record.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return [UserRateThrottle()]
+        return super().get_throttles()
     
     @action(detail=False, methods=['get'], url_path='user-records/(?P<user_id>\d+)', permission_classes=[IsAuthenticated])
     def user_records(self, request, user_id=None):
@@ -279,10 +384,10 @@ class RecordViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Пользователь не найден.'}, status=status.HTTP_404_NOT_FOUND)
 
         if request.user.role == 'ADMIN':
-            records = Record.objects.filter(user=user)
+            records = self.queryset.filter(user=user)
         
         elif request.user.role == 'STAFF':
-            records = Record.objects.filter(user=user, schedule__section__center__users=request.user)
+            records = self.queryset.filter(user=user, schedule__section__center_id__in=get_staff_center_ids(request))
         
         serializer = self.get_serializer(records, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -298,13 +403,16 @@ class RecordViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Расписание не существует.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            subscription = Subscription.objects.get(id=subscription_id, user=user, is_active=True)
+            subscription = Subscription.objects.with_currently_active().get(id=subscription_id, user=user)
         except Subscription.DoesNotExist:
             return Response({'error': 'У вас нет действующего абонемента.'}, status=status.HTTP_400_BAD_REQUEST)
 
         if not subscription.is_activated_by_admin:
             return Response({'error': 'Ваш абонемент не был активирован администратором.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if not subscription.currently_active:
+            return Response({'error': 'У вас нет действующего абонемента.'}, status=status.HTTP_400_BAD_REQUEST)
+
         current_datetime = timezone.now()
         schedule_datetime = timezone.make_aware(datetime.combine(schedule.date, schedule.start_time))
 
@@ -356,13 +464,16 @@ class RecordViewSet(viewsets.ModelViewSet):
         if conflicting_records_in_other_centers.exists():
             return Response({'error': 'Вы не можете записаться на два занятия в разных центрах с разницей менее 1 часа.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        record = Record.objects.create(
-            user=user,
-            schedule=schedule,
-            subscription=subscription
-        )
-        schedule.reserved += 1
-        schedule.save()
+        with transaction.atomic():
+            if not subscription.reserve_lesson():
+                return Response({'error': 'Лимит занятий по абонементу исчерпан.'}, status=status.HTTP_400_BAD_REQUEST)
+            record = Record.objects.create(
+                user=user,
+                schedule=schedule,
+                subscription=subscription
+            )
+            schedule.reserved += 1
+            schedule.save()
 
         serializer = self.get_serializer(record)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -376,10 +487,65 @@ class RecordViewSet(viewsets.ModelViewSet):
             section = Section.objects.get(id=section_id)
         except Section.DoesNotExist:
             return Response({'error': 'Раздел не найден.'}, status=status.HTTP_404_NOT_FOUND)
-        records = Record.objects.filter(user=request.user, schedule__section=section, attended=False)
+        records = self.queryset.filter(user=request.user, schedule__section=section, attended=False)
         serializer = self.get_serializer(records, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def checkin_token(self, request, pk=None):
+        """Подписанный токен для QR-кода, который сканирует сотрудник центра."""
+        record = self.get_object()
+        if record.user_id != request.user.id:
+            return Response({'error': 'Запись не найдена или у вас нет доступа к этой записи.'}, status=status.HTTP_404_NOT_FOUND)
+        if record.is_canceled:
+            return Response({'error': 'Резервирование отменено.'}, status=status.HTTP_400_BAD_REQUEST)
+        if record.attended:
+            return Response({'error': 'Вы уже посетили это занятие.'}, status=status.HTTP_400_BAD_REQUEST)
+        token, expires_at = make_checkin_token(record)
+        return Response({'token': token, 'expires_at': expires_at}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsCenterStaffOrAdmin])
+    def scan_checkins(self, request):
+        """
+        Отметка посещений по QR-токенам: {"tokens": [...]} (или {"token": "..."}).
+        Подписи проверяются без БД, посещения записываются одним UPDATE на пакет.
+        """
+        tokens = request.data.get('tokens')
+        if tokens is None and request.data.get('token'):
+            tokens = [request.data.get('token')]
+        if not isinstance(tokens, list) or not tokens:
+            return Response({'error': 'Требуется список токенов.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(tokens) > MAX_CHECKIN_BATCH:
+            return Response({'error': f'Не больше {MAX_CHECKIN_BATCH} токенов за запрос.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        center_ids = None if user.is_superuser or user.role == 'ADMIN' else get_staff_center_ids(request)
+        results = []
+        seen = set()
+        for token in tokens:
+            try:
+                data = verify_checkin_token(str(token))
+            except CheckinTokenError as exc:
+                results.append({'token': token, 'record_id': None, 'status': exc.status})
+                continue
+            record_id = data['record_id']
+            if center_ids is not None and data['center_id'] not in center_ids:
+                result_status = 'forbidden'
+            elif record_id in seen:
+                result_status = 'duplicate'
+            else:
+                result_status = None
+                seen.add(record_id)
+            results.append({'token': token, 'record_id': record_id, 'status': result_status})
+
+        pending = [result['record_id'] for result in results if result['status'] is None]
+        statuses = apply_checkins(pending) if pending else {}
+        for result in results:
+            if result['status'] is None:
+                result['status'] = statuses[result['record_id']]
+        checked_in = sum(result['status'] == 'checked_in' for result in results)
+        return Response({'checked_in': checked_in, 'results': results}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def confirm_attendance(self, request):
         record_id = request.data.get('record_id')
@@ -389,10 +555,8 @@ class RecordViewSet(viewsets.ModelViewSet):
             record = Record.objects.get(id=record_id, user=request.user)
         except Record.DoesNotExist:
             return Response({'error': 'Запись не найдена или у вас нет доступа к этой записи.'}, status=status.HTTP_404_NOT_FOUND)
-        if record.attended:
+        if not record.mark_attended():
             return Response({'error': 'Вы уже посетили это занятие.'}, status=status.HTTP_400_BAD_REQUEST)
-        record.attended = True
-        record.save()
         return Response({'message': 'Посещение успешно подтверждено.'}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -470,7 +634,7 @@ def dashboard_metrics(request):
     start_of_week = today - timedelta(days=today.weekday())
     
     total_users = CustomUser.objects.count()
-    active_subscriptions = Subscription.objects.filter(is_active=True).count()
+    active_subscriptions = Subscription.objects.currently_active().count()
     total_centers = Center.objects.count()
     lessons_today = Schedule.objects.filter(date=today).count()
     lessons_this_week = Schedule.objects.filter(date__gte=start_of_week, date__lte=today + timedelta(days=6)).count()
@@ -519,7 +683,7 @@ def dashboard_notifications(request):
     today = timezone.now().date()
 
     upcoming_lessons = Schedule.objects.filter(date__gte=today, date__lte=today + timedelta(days=7))
-    expired_subscriptions = Subscription.objects.filter(end_date__lt=today, is_active=False)
+    expired_subscriptions = Subscription.objects.with_currently_active().filter(end_date__lt=today, currently_active=False)
 
     return Response({
         'upcoming_lessons': [{
@@ -536,4 +700,46 @@ def dashboard_notifications(request):
             'section': subscription.section.name,
             'end_date': subscription.end_date,
         } for subscription in expired_subscriptions]
-    })
\ No newline at end of file
+    })
+
+
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import AllowAny
+from . import autocomplete
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def autocomplete_names(request):
+    """Подсказки по названиям центров, секций и категорий: ?q=фут&limit=10"""
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(int(request.query_params.get('limit', autocomplete.DEFAULT_LIMIT)), autocomplete.MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'Параметр "limit" должен быть целым числом.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': autocomplete.search(query, max(limit, 1))})
+
+
+from . import sync
+
+
+@api_view(['GET'])
+def sync_changes(request):
+    """
+    Изменения расписаний, секций, записей и подписок пользователя: ?since=<token>.
+    Без токена (или при reset=true в ответе) клиент загружает списки целиком
+    и дальше передаёт полученный token.
+    """
+    token = sync.current_token()
+    since = request.query_params.get('since')
+    if not since:
+        return Response({'token': token, 'reset': True})
+    try:
+        since = sync.decode_token(since)
+    except (ValueError, OverflowError):
+        return Response({'error': 'Некорректный параметр "since".'}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = sync.collect_changes(request, since)
+    if changes is None:
+        return Response({'token': token, 'reset': True})
+    return Response({'token': token, 'reset': False, **changes})
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+# Бэкенды, которые не делят данные между процессами
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache_configured(alias='default'):
+    """
+    True, если кэш общий для всех процессов (Redis, Memcached, БД, файлы).
+    Только на таком кэше можно строить инвалидацию между воркерами.
+    """
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY_DB = 'default'
+REPLICA_DB = 'replica'
+
+# True, пока текущий запрос может читать с реплики
+_replica_allowed = ContextVar('replica_allowed', default=False)
+# True внутри блока use_primary()
+_force_primary = ContextVar('force_primary', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+@contextmanager
+def use_primary():
+    """Все чтения внутри блока идут в основную БД."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Безопасные запросы (GET/HEAD/OPTIONS) читают с реплики.
+    Запись всегда идёт в основную БД, и после первой записи
+    все последующие чтения этого запроса тоже идут в основную БД.
+    Вне HTTP-запросов (celery, management-команды) используется основная БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (_replica_allowed.get() and not _force_primary.get()
+                and not connections[PRIMARY_DB].in_atomic_block):
+            return REPLICA_DB
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        _replica_allowed.set(False)
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY_DB, REPLICA_DB}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему через репликацию
+        return db == PRIMARY_DB
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica_allowed.set(replica_configured() and request.method in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            _replica_allowed.reset(token)
@@ -0,0 +1,162 @@
+"""
+Ограничение частоты запросов скользящим окном для DRF.
+
+Счётчик — «скользящее окно» из двух фиксированных: текущего и предыдущего,
+вклад предыдущего убывает линейно. Общие счётчики лежат в кэше Django
+(при нескольких процессах нужен общий бэкенд, см. CACHES), а перед ним стоит
+счётчик в памяти процесса. Он видит только запросы своего процесса, то есть
+даёт оценку снизу, поэтому отказ по нему всегда верен и не требует похода
+в кэш — при потоке запросов от бота кэш не нагружается.
+
+Лимиты берутся из REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] по ключу
+'<throttle_scope вью>_<kind>', например 'verify_sms_contact': '10/hour'.
+Если лимит не задан, троттл запрос пропускает. Retry-After выставляет
+обработчик исключений DRF по значению wait().
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+CACHE_KEY = 'throttle:{scope}:{ident}:{window}'
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60); формат тот же, что у SimpleRateThrottle."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def estimate(previous, current, elapsed):
+    """Оценка числа запросов за последнее окно; elapsed — доля прошедшего текущего окна."""
+    return previous * (1 - elapsed) + current
+
+
+def retry_after(previous, current, elapsed, limit, duration):
+    """Через сколько секунд оценка опустится до limit - 1 и запрос пройдёт."""
+    allowed = limit - 1
+    if current > allowed:
+        # Ждём конца текущего окна, затем пока его вклад (уже как предыдущего) не уменьшится
+        fraction = 1 - allowed / current
+        return (1 - elapsed + fraction) * duration
+    fraction = 1 - (allowed - current) / previous
+    return max(fraction - elapsed, 0) * duration
+
+
+class LocalWindowCounts:
+    """Счётчики окон в памяти процесса, ограниченные по числу ключей (LRU)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, window):
+        with self._lock:
+            return self._data.get((key, window), 0)
+
+    def incr(self, key, window):
+        with self._lock:
+            item = (key, window)
+            self._data[item] = self._data.get(item, 0) + 1
+            self._data.move_to_end(item)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_counts = LocalWindowCounts(max_size=10000)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    kind = None
+    timer = time.time
+
+    def get_ident_value(self, request, view):
+        """Кого ограничиваем; None — троттл к запросу не применяется."""
+        raise NotImplementedError
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return None, None
+        return scope, api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope, rate = self.get_rate(view)
+        ident = self.get_ident_value(request, view) if rate else None
+        if ident is None:
+            return True
+
+        limit, duration = parse_rate(rate)
+        now = self.timer()
+        window = int(now // duration)
+        elapsed = now / duration - window
+        digest = hashlib.sha256(f'{self.kind}:{ident}'.encode()).hexdigest()[:32]
+        local_key = f'{scope}:{digest}'
+
+        previous, current = local_counts.get(local_key, window - 1), local_counts.get(local_key, window)
+        if estimate(previous, current, elapsed) + 1 > limit:
+            return self.deny(previous, current, elapsed, limit, duration)
+
+        previous_key = CACHE_KEY.format(scope=scope, ident=digest, window=window - 1)
+        current_key = CACHE_KEY.format(scope=scope, ident=digest, window=window)
+        counts = cache.get_many([previous_key, current_key])
+        previous, current = counts.get(previous_key, 0), counts.get(current_key, 0)
+        if estimate(previous, current, elapsed) + 1 > limit:
+            return self.deny(previous, current, elapsed, limit, duration)
+
+        # Ключ нужен ещё одно окно, пока он учитывается как предыдущий
+        cache.add(current_key, 0, timeout=2 * duration)
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            # Ключ успел истечь между add и incr
+            cache.set(current_key, 1, timeout=2 * duration)
+        local_counts.incr(local_key, window)
+        return True
+
+    def deny(self, previous, current, elapsed, limit, duration):
+        self.wait_seconds = max(1, math.ceil(retry_after(previous, current, elapsed, limit, duration)))
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    kind = 'ip'
+
+    def get_ident_value(self, request, view):
+        return self.get_ident(request)
+
+
+class ContactRateThrottle(SlidingWindowThrottle):
+    """По номеру телефона или email из тела запроса."""
+    kind = 'contact'
+
+    def get_ident_value(self, request, view):
+        for field in ('phone_number', 'email'):
+            value = request.data.get(field)
+            if isinstance(value, str) and value.strip():
+                return f'{field}:{value.strip().lower()}'
+        return None
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    kind = 'user'
+
+    def get_ident_value(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
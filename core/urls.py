@@ -1,13 +1,12 @@
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
+from api.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('user/', include('user.urls')),  
     path('api/', include('api.urls')),
-
+    # Доступ проверяет Django, а байты отдаёт прокси (см. api/media.py)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
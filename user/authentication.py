@@ -0,0 +1,137 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from core.caches import shared_cache_configured
+from core.db_router import use_primary
+
+AUTH_VERSION_KEY = 'user:auth_version:{}'
+
+
+def get_auth_version(user_id):
+    """
+    Текущая версия данных пользователя, влияющих на авторизацию
+    (роль, активность, закреплённые центры). Хранится в общем кэше.
+    """
+    key = AUTH_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Версия потерялась (вытеснение, рестарт кэша) — выдаём новую,
+        # чтобы ранее выданные claims больше не считались актуальными.
+        version = uuid.uuid4().hex[:12]
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_auth_version(user_id):
+    cache.set(AUTH_VERSION_KEY.format(user_id), uuid.uuid4().hex[:12], None)
+
+
+def add_principal_claims(token, user):
+    """Добавляет в токен роль, активность, центры STAFF и версию пользователя."""
+    token['role'] = user.role
+    token['is_active'] = user.is_active
+    token['center_ids'] = (
+        list(user.editable_centers.values_list('id', flat=True)) if user.role == 'STAFF' else []
+    )
+    token['auth_version'] = get_auth_version(user.pk)
+    return token
+
+
+class PrincipalCache:
+    """Небольшой потокобезопасный LRU-кэш с TTL в памяти процесса."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+principal_cache = PrincipalCache(
+    max_size=getattr(settings, 'USER_PRINCIPAL_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'USER_PRINCIPAL_CACHE_TTL', 60),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая берёт пользователя из кэша процесса.
+    Запись кэша привязана к версии пользователя, поэтому изменение роли,
+    активности или центров сразу приводит к повторной загрузке из БД.
+    Если claims токена актуальны, центры STAFF берутся прямо из токена.
+
+    Версии живут в кэше Django. Если он локальный для процесса (LocMemCache
+    без REDIS_CACHE_URL), изменения из других воркеров в нём не видны, поэтому
+    кэш пользователей и claims не используются: пользователь и центры STAFF
+    читаются из БД, как в обычной JWTAuthentication.
+    """
+    _auth_version = None
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+
+        user, token = result
+        if (self._auth_version is not None and token.get('auth_version') == self._auth_version
+                and user.role == 'STAFF'):
+            request._staff_center_ids = frozenset(token.get('center_ids', []))
+        return user, token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        if not shared_cache_configured():
+            self._auth_version = None
+            return super().get_user(validated_token)
+
+        self._auth_version = get_auth_version(user_id)
+        claims_are_current = validated_token.get('auth_version') == self._auth_version
+        if claims_are_current and validated_token.get('is_active') is False:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        key = (user_id, self._auth_version)
+        user = principal_cache.get(key)
+        if user is None:
+            # Реплика может отставать, а запись кэша живёт до следующей смены версии
+            with use_primary():
+                user = super().get_user(validated_token)
+            principal_cache.set(key, user)
+
+        # Отдаём копию, чтобы изменения в представлении не попали в кэш
+        return copy.copy(user)
@@ -1,15 +1,42 @@
 from django.contrib.auth.backends import ModelBackend
 from .models import CustomUser
 
+
+def find_user_by_login(login):
+    """
+    Пользователь по email или номеру телефона. Поле выбирается по наличию '@',
+    поэтому это один запрос по одному уникальному индексу (а не OR по двум).
+    """
+    field = 'email' if '@' in login else 'phone_number'
+    try:
+        return CustomUser.objects.get(**{field: login})
+    except CustomUser.DoesNotExist:
+        return None
+
+
+def authenticate_login(login, password):
+    """
+    Проверяет логин и пароль, вычисляя хэш ровно один раз. Активность не
+    проверяется. Если хэш создан другим хэшером или с другим числом итераций,
+    check_password прозрачно пересохраняет его в текущем формате.
+    """
+    if not login or password is None:
+        return None
+    user = find_user_by_login(login)
+    if user is None:
+        # Хэшируем впустую, чтобы по времени ответа нельзя было понять, есть ли пользователь
+        CustomUser().set_password(password)
+        return None
+    if user.check_password(password):
+        return user
+    return None
+
+
 class EmailOrPhoneBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = CustomUser.objects.get(
-                models.Q(email=username) | models.Q(phone_number=username)
-            )
-        except CustomUser.DoesNotExist:
-            return None
-        
-        if user.check_password(password):
+        if username is None:
+            username = kwargs.get(CustomUser.USERNAME_FIELD)
+        user = authenticate_login(username, password)
+        if user is not None and self.user_can_authenticate(user):
             return user
         return None
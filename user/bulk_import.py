@@ -0,0 +1,247 @@
+"""
+Массовый импорт пользователей из CSV/XLSX.
+
+Файл читается в DataFrame и проверяется целиком (маски pandas вместо проверки
+построчно, уникальность — одним запросом на колонку). Пароли хэшируются в пуле
+процессов, пользователи вставляются через bulk_create пачками, связи
+родитель/ребёнок проставляются вторым проходом, а письма/SMS подтверждения
+уходят в Celery после коммита.
+
+Колонки: first_name, last_name (обязательные), email, phone_number, iin, role,
+password, parent — email, телефон или ИИН родителя (из этого же файла или уже
+существующего пользователя).
+"""
+import os
+import time
+from zipfile import BadZipFile
+
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from openpyxl.utils.exceptions import InvalidFileException
+
+from .models import CustomUser
+from .passwords import hash_passwords
+
+REQUIRED_COLUMNS = ('first_name', 'last_name')
+OPTIONAL_COLUMNS = ('email', 'phone_number', 'iin', 'role', 'password', 'parent')
+UNIQUE_COLUMNS = ('email', 'phone_number', 'iin')
+# Администраторов импортом не создаём
+IMPORT_ROLES = ('USER', 'CHILD', 'PARENT', 'STAFF')
+
+EMAIL_RE = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+PHONE_RE = r'^\+?\d{10,14}$'
+IIN_RE = r'^\d{12}$'
+
+# Ограничение числа параметров в одном IN (SQLite)
+LOOKUP_CHUNK_SIZE = 900
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def read_table(fileobj, filename, max_rows=None):
+    extension = os.path.splitext(filename)[1].lower()
+    try:
+        if extension in ('.xlsx', '.xlsm'):
+            frame = pd.read_excel(fileobj, dtype=str, engine='openpyxl')
+        elif extension == '.csv':
+            frame = pd.read_csv(fileobj, dtype=str, encoding='utf-8-sig', keep_default_na=False)
+        else:
+            raise ImportFileError('Поддерживаются только файлы CSV и XLSX.')
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError, BadZipFile, InvalidFileException) as exc:
+        raise ImportFileError(f'Не удалось прочитать файл: {exc}')
+
+    if max_rows is not None and len(frame) > max_rows:
+        raise ImportFileError(f'Слишком много строк: {len(frame)}, максимум {max_rows}.')
+    frame.columns = frame.columns.str.strip().str.lower()
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ImportFileError(f'В файле нет обязательных колонок: {", ".join(missing)}.')
+    for column in OPTIONAL_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = ''
+    frame = frame[list(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)].fillna('').astype(str)
+    frame = frame.apply(lambda column: column.str.strip())
+
+    frame['email'] = normalize_emails(frame['email'])
+    frame['parent'] = normalize_emails(frame['parent'])
+    frame['role'] = frame['role'].str.upper().replace('', 'USER')
+    frame.index = pd.RangeIndex(2, len(frame) + 2)  # номер строки в файле (1 — заголовок)
+    return frame
+
+
+def normalize_emails(column):
+    """Как CustomUserManager.normalize_email: домен в нижнем регистре; остальные значения не меняются."""
+    has_email = column.str.contains('@', regex=False)
+    parts = column.str.rsplit('@', n=1)
+    normalized = parts.str[0] + '@' + parts.str[-1].str.lower()
+    return column.where(~has_email, normalized)
+
+
+def _existing_values(column, values):
+    existing = {}
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        existing.update(CustomUser.objects.filter(**{f'{column}__in': chunk}).values_list(column, 'id'))
+    return existing
+
+
+def validate(frame):
+    """
+    Ошибки по номерам строк и id уже существующих родителей (ключ -> id).
+    """
+    checks = [
+        (frame['first_name'] == '', 'Не указано имя.'),
+        (frame['last_name'] == '', 'Не указана фамилия.'),
+        ((frame['first_name'].str.len() > 30) | (frame['last_name'].str.len() > 30), 'Имя и фамилия — не длиннее 30 символов.'),
+        ((frame['email'] == '') & (frame['phone_number'] == ''), 'Нужен email или номер телефона.'),
+        ((frame['email'] != '') & ~frame['email'].str.match(EMAIL_RE), 'Некорректный email.'),
+        ((frame['phone_number'] != '') & ~frame['phone_number'].str.match(PHONE_RE), 'Некорректный номер телефона.'),
+        (~frame['role'].isin(IMPORT_ROLES), f'Роль должна быть одной из: {", ".join(IMPORT_ROLES)}.'),
+        ((frame['role'] != 'STAFF') & (frame['iin'] == ''), 'ИИН обязателен для всех, кроме сотрудников.'),
+        ((frame['iin'] != '') & ~frame['iin'].str.match(IIN_RE), 'ИИН должен состоять из 12 цифр.'),
+    ]
+
+    file_keys = set()
+    for column in UNIQUE_COLUMNS:
+        filled = frame[column] != ''
+        checks.append((filled & frame[column].duplicated(keep=False), f'Значение {column} повторяется в файле.'))
+        existing = _existing_values(column, frame.loc[filled, column].unique())
+        checks.append((filled & frame[column].isin(list(existing)), f'Пользователь с таким {column} уже существует.'))
+        file_keys.update(frame.loc[filled, column])
+
+    has_parent = frame['parent'] != ''
+    outside_keys = set(frame.loc[has_parent & ~frame['parent'].isin(list(file_keys)), 'parent'])
+    existing_parents = {}
+    for column in UNIQUE_COLUMNS:
+        existing_parents.update(_existing_values(column, outside_keys))
+    known_parents = list(file_keys | set(existing_parents))
+    checks.append((has_parent & ~frame['parent'].isin(known_parents), 'Родитель не найден.'))
+
+    errors = {}
+    for mask, message in checks:
+        for row in frame.index[mask]:
+            errors.setdefault(int(row), []).append(message)
+    _add_orphan_errors(frame, errors, existing_parents)
+    return errors, existing_parents
+
+
+def _add_orphan_errors(frame, errors, existing_parents):
+    """
+    Дети, чей родитель из файла сам отбракован, тоже ошибочны: после пропуска
+    ошибочных строк привязать их будет не к кому. Повторяем до устойчивого
+    состояния, так как отбракованный ребёнок может быть родителем для других.
+    """
+    while True:
+        valid = frame.drop(index=list(errors))
+        valid_keys = set(existing_parents)
+        for column in UNIQUE_COLUMNS:
+            valid_keys.update(valid.loc[valid[column] != '', column])
+        orphans = valid.index[(valid['parent'] != '') & ~valid['parent'].isin(list(valid_keys))]
+        if orphans.empty:
+            return
+        for row in orphans:
+            errors.setdefault(int(row), []).append('Строка родителя содержит ошибки.')
+
+
+def _refetch_ids(users):
+    """id после bulk_create для СУБД, которые не возвращают их сами."""
+    missing = [user for user in users if user.pk is None]
+    if not missing:
+        return
+    query = Q()
+    for column in UNIQUE_COLUMNS:
+        values = [getattr(user, column) for user in missing if getattr(user, column)]
+        if values:
+            query |= Q(**{f'{column}__in': values})
+    by_key = {}
+    for row in CustomUser.objects.filter(query).values('id', *UNIQUE_COLUMNS):
+        for column in UNIQUE_COLUMNS:
+            if row[column]:
+                by_key[(column, row[column])] = row['id']
+    for user in missing:
+        column = next(column for column in UNIQUE_COLUMNS if getattr(user, column))
+        user.pk = by_key[(column, getattr(user, column))]
+
+
+def import_users(fileobj, filename, workers=None, batch_size=500, activate=False,
+                 skip_invalid=False, dry_run=False, base_url=None, max_rows=None):
+    """
+    Импортирует пользователей и возвращает отчёт. Если в файле есть ошибки,
+    ничего не создаётся (или ошибочные строки пропускаются при skip_invalid).
+    """
+    from .tasks import send_verification_message
+
+    started = time.perf_counter()
+    frame = read_table(fileobj, filename, max_rows)
+    errors, existing_parents = validate(frame)
+    report = {
+        'rows': len(frame),
+        'created': 0,
+        'skipped': len(errors),
+        'errors': [{'row': row, 'errors': messages} for row, messages in sorted(errors.items())],
+    }
+    validated = time.perf_counter()
+    if (errors and not skip_invalid) or dry_run:
+        report['seconds'] = {'validate': round(validated - started, 3)}
+        return report
+
+    frame = frame.drop(index=list(errors))
+    with_password = frame['password'] != ''
+    hashes = pd.Series(make_password(None), index=frame.index)
+    hashes[with_password] = hash_passwords(frame.loc[with_password, 'password'], workers)
+    hashed = time.perf_counter()
+
+    users = [
+        CustomUser(
+            email=row.email or None,
+            phone_number=row.phone_number or None,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            iin=row.iin or None,
+            role=row.role,
+            password=hashes[row.Index],
+            is_active=activate,
+            is_verified=activate,
+        )
+        for row in frame.itertuples()
+    ]
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(users, batch_size=batch_size)
+        _refetch_ids(users)
+
+        # Второй проход: родители могут идти в файле после детей
+        ids_by_key = dict(existing_parents)
+        for user in users:
+            for column in UNIQUE_COLUMNS:
+                if getattr(user, column):
+                    ids_by_key[getattr(user, column)] = user.pk
+        children = []
+        for user, parent_key in zip(users, frame['parent']):
+            if parent_key:
+                user.parent_id = ids_by_key[parent_key]
+                children.append(user)
+        CustomUser.objects.bulk_update(children, ['parent'], batch_size=batch_size)
+
+        if not activate:
+            user_ids = [user.pk for user in users]
+            transaction.on_commit(lambda: [send_verification_message.delay(user_id, base_url) for user_id in user_ids])
+    inserted = time.perf_counter()
+
+    total = inserted - started
+    report.update({
+        'created': len(users),
+        'linked_children': len(children),
+        'seconds': {
+            'validate': round(validated - started, 3),
+            'hash': round(hashed - validated, 3),
+            'insert': round(inserted - hashed, 3),
+            'total': round(total, 3),
+        },
+        'rows_per_second': round(len(users) / total, 1) if total else None,
+    })
+    return report
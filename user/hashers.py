@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 с числом итераций из PASSWORD_PBKDF2_ITERATIONS. Алгоритм тот же
+    (pbkdf2_sha256), поэтому старые хэши проверяются как обычно, а при входе
+    must_update пересчитывает их под новое число итераций.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
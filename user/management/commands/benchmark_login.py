@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.hashers import identify_hasher
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from user.models import CustomUser
+from user.serializers import CustomTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = 'Measures login throughput per core (single process) and password hashes computed per login'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--phone', action='store_true', help='Log in by phone number instead of email')
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        password = 'benchmark-password'
+        # Временный пользователь: всё откатывается в конце
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(
+                email='login-benchmark@example.com', phone_number='+70000000000',
+                first_name='Benchmark', last_name='Login', password=password, is_active=True,
+            )
+            login = user.phone_number if options['phone'] else user.email
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                user.check_password(password)
+            hash_seconds = (time.perf_counter() - started) / iterations
+
+            hasher = identify_hasher(user.password)
+            verify = hasher.verify
+            calls = 0
+
+            def counting_verify(*args, **kwargs):
+                nonlocal calls
+                calls += 1
+                return verify(*args, **kwargs)
+
+            hasher.verify = counting_verify
+            try:
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    serializer = CustomTokenObtainPairSerializer(data={'email': login, 'password': password})
+                    serializer.is_valid(raise_exception=True)
+                login_seconds = (time.perf_counter() - started) / iterations
+            finally:
+                del hasher.verify
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{hasher.algorithm} ({getattr(hasher, "iterations", "-")} iterations): '
+            f'{1 / login_seconds:.1f} logins/s per core, {login_seconds * 1000:.1f} ms per login, '
+            f'{hash_seconds * 1000:.1f} ms per hash, {calls / iterations:g} hashes per login'
+        ))
@@ -72,6 +72,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_superuser = models.BooleanField(default=False)  
     is_verified = models.BooleanField(default=False)  
     date_joined = models.DateTimeField(default=timezone.now)
+    # Не используется: коды подтверждения хранятся в кэше (user/verification.py)
     sms_code = models.CharField(max_length=6, null=True, blank=True) 
 
     objects = CustomUserManager()
@@ -87,4 +88,14 @@ class DeviceToken(models.Model):
     token = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
-        return f"{self.user.email} - {self.token}"
\ No newline at end of file
+        return f"{self.user.email} - {self.token}"
+
+class VerificationCode(models.Model):
+    """
+    Код подтверждения по SMS, если общего кэша нет (user/verification.py).
+    Отдельная маленькая таблица, чтобы не писать в строки пользователей.
+    """
+    key = models.CharField(max_length=32, unique=True)
+    code_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
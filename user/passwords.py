@@ -0,0 +1,33 @@
+"""
+Хэширование паролей пачкой в пуле процессов.
+
+PBKDF2 занимает процессор целиком, поэтому при массовом импорте пароли
+считаются параллельно в отдельных процессах. Модуль не импортирует модели,
+чтобы его можно было загрузить в дочернем процессе до django.setup().
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Меньше этого числа паролей пул процессов не окупает свой запуск
+MIN_PARALLEL_PASSWORDS = 16
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _make_password(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+def hash_passwords(passwords, workers=None):
+    """Хэши паролей в том же порядке; None даёт непригодный для входа пароль."""
+    passwords = list(passwords)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < MIN_PARALLEL_PASSWORDS:
+        return [_make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(_make_password, passwords, chunksize=chunksize))
@@ -9,8 +9,13 @@ from django.core.mail import send_mail
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.utils.http import urlsafe_base64_decode
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import add_principal_claims
+from .backends import authenticate_login
+from django.contrib.auth.models import update_last_login
 
 class DeviceTokenSerializer(serializers.ModelSerializer):
     class Meta:
@@ -64,13 +69,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=password,
             role=role
         )
-
-        # Automatically set is_staff and is_superuser for ADMIN role
-        if role == 'ADMIN':
-            user.is_staff = True
-            user.is_superuser = True  
-
-        user.save()
+        # is_staff/is_superuser для ADMIN выставляет create_user, повторный save() не нужен
 
         # Send verification based on email or SMS
         if user.email:
@@ -145,27 +144,29 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
-        return token
+        return add_principal_claims(token, user)
 
     def validate(self, attrs):
-        email_or_phone = attrs.get('email', None)
-        password = attrs.get('password', None)
-
-        try:
-            if '@' in email_or_phone:
-                user = CustomUser.objects.get(email=email_or_phone)
-            else:
-                user = CustomUser.objects.get(phone_number=email_or_phone)
-        except CustomUser.DoesNotExist:
+        # Не вызываем super().validate(): он снова прогнал бы пароль через
+        # authenticate(), и хэш считался бы дважды за один вход
+        self.user = authenticate_login(attrs.get(self.username_field), attrs.get('password'))
+        if self.user is None:
             raise serializers.ValidationError("Invalid login credentials.")
+        if not self.user.is_active:
+            raise serializers.ValidationError("Account is not activated yet.")
 
-        if user.check_password(password):
-            if not user.is_active:
-                raise serializers.ValidationError("Account is not activated yet.")
-            return super().validate(attrs)
-        else:
-            raise serializers.ValidationError("Invalid login credentials.")
-
-
+        refresh = self.get_token(self.user)
+        data = {'refresh': str(refresh), 'access': str(refresh.access_token)}
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return data
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновляет claims пользователя в новом access-токене."""
 
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = CustomUser.objects.get(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        data['access'] = str(add_principal_claims(access, user))
+        return data
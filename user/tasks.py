@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from .models import CustomUser
+from .utils import send_verification_email, send_verification_sms
+
+
+@shared_task
+def send_verification_message(user_id, base_url=None):
+    """Письмо или SMS с подтверждением для пользователя, созданного вне регистрации (импорт)."""
+    user = CustomUser.objects.filter(pk=user_id, is_verified=False).first()
+    if user is None:
+        return
+    if user.email:
+        send_verification_email(user, base_url=base_url)
+    elif user.phone_number:
+        send_verification_sms(user)
+    print(f"Отправлено подтверждение пользователю {user_id}")
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.throttling import IPRateThrottle, estimate, local_counts, retry_after
+
+TEST_RATES = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'test_ip': '2/min'}}
+
+
+class RetryAfterTests(SimpleTestCase):
+    def assert_allowed_after_wait(self, previous, current, elapsed, limit, duration):
+        """Через retry_after секунд оценка пропускает запрос, а чуть раньше — ещё нет."""
+        wait = retry_after(previous, current, elapsed, limit, duration)
+
+        def estimate_after(seconds):
+            moment = elapsed + seconds / duration
+            if moment < 1:
+                return estimate(previous, current, moment)
+            # Текущее окно стало предыдущим
+            return estimate(current, 0, moment - 1)
+
+        self.assertLessEqual(estimate_after(wait) + 1, limit + 1e-9)
+        if wait > 1:
+            self.assertGreater(estimate_after(wait - 1) + 1, limit)
+        return wait
+
+    def test_current_window_full(self):
+        self.assertAlmostEqual(self.assert_allowed_after_wait(0, 5, 0.5, 5, 60), 42)
+
+    def test_previous_window_decays(self):
+        self.assertAlmostEqual(self.assert_allowed_after_wait(10, 0, 0.25, 5, 60), 21)
+
+    def test_mixed_windows(self):
+        for previous, current, elapsed in ((8, 2, 0.1), (4, 4, 0.9), (100, 1, 0.5), (3, 3, 0.0)):
+            with self.subTest(previous=previous, current=current, elapsed=elapsed):
+                self.assertGreaterEqual(self.assert_allowed_after_wait(previous, current, elapsed, 5, 60), 0)
+
+
+@override_settings(REST_FRAMEWORK=TEST_RATES)
+class SlidingWindowThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_counts.clear()
+        self.now = 60 * 16_667 + 15.0  # 15 секунд от начала минутного окна
+        self.view = SimpleNamespace(throttle_scope='test')
+        self.request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+
+    def allow(self):
+        throttle = IPRateThrottle()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(self.request, self.view), throttle.wait()
+
+    def test_denies_over_limit_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.allow(), (True, None))
+        allowed, wait = self.allow()
+        self.assertFalse(allowed)
+        # Окно заканчивается через 45 с, затем ещё 30 с, пока вклад 2 запросов не упадёт до 1
+        self.assertEqual(wait, 75)
+
+        self.now += wait - 1
+        self.assertFalse(self.allow()[0])
+        self.now += 1
+        self.assertEqual(self.allow(), (True, None))
+
+    def test_other_addresses_are_not_limited(self):
+        for _ in range(2):
+            self.allow()
+        self.request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.allow(), (True, None))
+
+    def test_unknown_scope_is_not_limited(self):
+        self.view = SimpleNamespace(throttle_scope='other')
+        for _ in range(10):
+            self.assertEqual(self.allow(), (True, None))
+
+
+class VerifySMSThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_counts.clear()
+
+    def test_retry_after_header(self):
+        client = APIClient()
+        limit = int(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['verify_sms_contact'].split('/')[0])
+        for _ in range(limit):
+            response = client.post('/user/verify-sms/', {'phone_number': '+77010000000', 'code': '000000'})
+            self.assertNotEqual(response.status_code, 429)
+        response = client.post('/user/verify-sms/', {'phone_number': '+77010000000', 'code': '000000'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import register_device_token, UserViewSet, UserByTokenView, VerifyEmailView, UserProfileView, PasswordResetRequestView, PasswordResetConfirmView, VerifySMSView, AdminCreateStaffView
+from .views import register_device_token, UserViewSet, UserByTokenView, VerifyEmailView, UserProfileView, PasswordResetRequestView, PasswordResetConfirmView, VerifySMSView, AdminCreateStaffView, AdminImportUsersView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 router = DefaultRouter()
@@ -18,6 +18,7 @@ urlpatterns = [
     path('verify-sms/', VerifySMSView.as_view(), name='verify-sms'),
     path('register-device-token/', register_device_token, name='register-device-token'),
     path('admin/create-staff/', AdminCreateStaffView.as_view(), name='admin-create-staff'),
+    path('admin/import-users/', AdminImportUsersView.as_view(), name='admin-import-users'),
 
     path('', include(router.urls)),
 ]
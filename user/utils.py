@@ -6,14 +6,20 @@ from django.utils.encoding import force_bytes
 from django.core.mail import send_mail
 from django.conf import settings
 from twilio.rest import Client
+from .verification import issue_code
 
 def generate_random_password(length=8):
     return ''.join(random.choices(string.digits, k=length))
 
-def send_verification_email(user, request):
+def send_verification_email(user, request=None, base_url=None):
+    # Вне запроса (Celery, импорт) ссылка строится от base_url или SITE_URL
     token = default_token_generator.make_token(user)
     uid = urlsafe_base64_encode(force_bytes(user.pk))
-    verification_link = f"{request.build_absolute_uri('/user/verify-email/')}?uid={uid}&token={token}"
+    if request is not None:
+        verify_url = request.build_absolute_uri('/user/verify-email/')
+    else:
+        verify_url = f"{(base_url or settings.SITE_URL).rstrip('/')}/user/verify-email/"
+    verification_link = f"{verify_url}?uid={uid}&token={token}"
     
     send_mail(
         subject="Подтверждение регистрации",
@@ -22,13 +28,9 @@ def send_verification_email(user, request):
         recipient_list=[user.email],
     )
 
-def generate_sms_code():
-    return random.randint(100000, 999999)
-
 def send_verification_sms(user):
-    sms_code = generate_sms_code()
-    user.sms_code = sms_code  
-    user.save()
+    # Код хранится в кэше (user/verification.py), строку пользователя не трогаем
+    sms_code = issue_code(user.phone_number)
 
     client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
     message = client.messages.create(
@@ -36,5 +38,3 @@ def send_verification_sms(user):
         from_=settings.TWILIO_PHONE_NUMBER,
         to=user.phone_number
     )
-
-
@@ -0,0 +1,97 @@
+"""
+Коды подтверждения по SMS вне строки пользователя.
+
+Код живёт VERIFICATION_CODE_TTL секунд, на него даётся VERIFICATION_MAX_ATTEMPTS
+попыток, после чего он сгорает. Хранится только HMAC кода, сравнение — за
+постоянное время.
+
+Код выдаёт один процесс (веб-воркер или задача Celery), а проверяет другой,
+поэтому хранилище должно быть общим. При общем кэше (REDIS_CACHE_URL) коды
+лежат в нём, иначе — в таблице VerificationCode.
+"""
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from core.caches import shared_cache_configured
+from .models import VerificationCode
+
+VERIFICATION_CODE_TTL = 10 * 60
+VERIFICATION_MAX_ATTEMPTS = 5
+CODE_KEY = 'verify:sms:{}'
+ATTEMPTS_KEY = 'verify:sms:{}:attempts'
+
+
+def _digest(value):
+    return hmac.new(settings.SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+def _ident(phone_number):
+    return _digest(f'phone:{phone_number}')[:32]
+
+
+def issue_code(phone_number):
+    """Новый 6-значный код для номера; предыдущий код и счётчик попыток сбрасываются."""
+    code = f'{secrets.randbelow(10 ** 6):06d}'
+    ident = _ident(phone_number)
+    if shared_cache_configured():
+        cache.set_many({CODE_KEY.format(ident): _digest(code), ATTEMPTS_KEY.format(ident): 0},
+                       timeout=VERIFICATION_CODE_TTL)
+    else:
+        now = timezone.now()
+        VerificationCode.objects.filter(expires_at__lte=now).delete()
+        VerificationCode.objects.update_or_create(key=ident, defaults={
+            'code_hash': _digest(code),
+            'attempts': 0,
+            'expires_at': now + timedelta(seconds=VERIFICATION_CODE_TTL),
+        })
+    return code
+
+
+def check_code(phone_number, code):
+    """'ok', 'invalid', 'expired' (кода нет или истёк) или 'too_many_attempts'."""
+    ident = _ident(phone_number)
+    if shared_cache_configured():
+        return _check_cached(ident, code)
+    return _check_stored(ident, code)
+
+
+def _check_cached(ident, code):
+    code_key, attempts_key = CODE_KEY.format(ident), ATTEMPTS_KEY.format(ident)
+    expected = cache.get(code_key)
+    if expected is None:
+        return 'expired'
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # Счётчик вытеснен раньше кода — начинаем заново, но код остаётся ограниченным по TTL
+        cache.set(attempts_key, 1, timeout=VERIFICATION_CODE_TTL)
+        attempts = 1
+    if attempts > VERIFICATION_MAX_ATTEMPTS:
+        cache.delete_many([code_key, attempts_key])
+        return 'too_many_attempts'
+    if not hmac.compare_digest(expected, _digest(str(code or ''))):
+        return 'invalid'
+    cache.delete_many([code_key, attempts_key])
+    return 'ok'
+
+
+def _check_stored(ident, code):
+    codes = VerificationCode.objects.filter(key=ident, expires_at__gt=timezone.now())
+    expected = codes.values_list('code_hash', flat=True).first()
+    if expected is None:
+        return 'expired'
+    # Попытка засчитывается условным UPDATE, поэтому параллельные запросы не превысят лимит
+    if not codes.filter(attempts__lt=VERIFICATION_MAX_ATTEMPTS).update(attempts=F('attempts') + 1):
+        codes.delete()
+        return 'too_many_attempts'
+    if not hmac.compare_digest(expected, _digest(str(code or ''))):
+        return 'invalid'
+    codes.delete()
+    return 'ok'
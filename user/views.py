@@ -10,6 +10,8 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.tokens import default_token_generator
 from .pagination import StandardResultsSetPagination
 from django.shortcuts import render
+from core.throttling import ContactRateThrottle, IPRateThrottle
+from .verification import check_code
 
 
 @api_view(['POST'])
@@ -33,6 +35,13 @@ class RegisterView(generics.CreateAPIView):
 class UserViewSet(viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     pagination_class = StandardResultsSetPagination
+    throttle_scope = 'register'
+
+    def get_throttles(self):
+        # Регистрация отправляет письмо или SMS
+        if self.action == 'create':
+            return [IPRateThrottle(), ContactRateThrottle()]
+        return super().get_throttles()
     
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -115,6 +124,8 @@ class PasswordResetRequestView(generics.GenericAPIView):
     permission_classes = [AllowAny]
     serializer_class = PasswordResetRequestSerializer
     pagination_class = StandardResultsSetPagination
+    throttle_classes = [IPRateThrottle, ContactRateThrottle]
+    throttle_scope = 'password_reset'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -151,22 +162,36 @@ class PasswordResetConfirmView(generics.GenericAPIView):
 
 
 class VerifySMSView(generics.GenericAPIView):
+    # Подтверждает ещё не активированный аккаунт, войти пользователь пока не может
+    permission_classes = [AllowAny]
+    throttle_classes = [IPRateThrottle, ContactRateThrottle]
+    throttle_scope = 'verify_sms'
+
+    errors = {
+        'invalid': 'Invalid SMS code.',
+        'expired': 'SMS code has expired or was not requested.',
+        'too_many_attempts': 'Too many attempts. Request a new SMS code.',
+    }
+
     def post(self, request, *args, **kwargs):
         phone_number = request.data.get('phone_number')
         sms_code = request.data.get('sms_code')
-        pagination_class = StandardResultsSetPagination
+        if not phone_number:
+            return Response({'error': 'phone_number is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Код проверяется по кэшу; строку пользователя читаем и пишем только при успехе
+        result = check_code(phone_number, sms_code)
+        if result != 'ok':
+            return Response({'error': self.errors[result]}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             user = CustomUser.objects.get(phone_number=phone_number)
-            if user.sms_code == sms_code:
-                user.is_verified = True
-                user.is_active = True  
-                user.save()
-                return Response({'detail': 'Account successfully verified.'}, status=status.HTTP_200_OK)
-            else:
-                return Response({'error': 'Invalid SMS code.'}, status=status.HTTP_400_BAD_REQUEST)
         except CustomUser.DoesNotExist:
             return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+        user.is_verified = True
+        user.is_active = True
+        user.save(update_fields=['is_verified', 'is_active'])
+        return Response({'detail': 'Account successfully verified.'}, status=status.HTTP_200_OK)
 
 from rest_framework.permissions import IsAdminUser
 from rest_framework import status, generics
@@ -207,3 +232,44 @@ class AdminCreateStaffView(generics.CreateAPIView):
 
 
 
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
+from .bulk_import import ImportFileError, import_users
+
+
+class AdminImportUsersView(APIView):
+    """Массовый импорт пользователей из CSV/XLSX (поле file), см. user/bulk_import.py."""
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+    # Большие файлы — через manage.py import_users, чтобы не держать воркер
+    max_rows = 5000
+
+    def post(self, request):
+        if request.user.role != 'ADMIN':
+            return Response({'error': 'Импорт доступен только администраторам.'}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Файл не передан.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def flag(name):
+            return str(request.data.get(name, '')).lower() in ('1', 'true', 'yes')
+
+        try:
+            report = import_users(
+                upload, upload.name,
+                # Без пула процессов: форкать воркеры из веб-воркера нельзя,
+                # параллельное хэширование — только в manage.py import_users
+                workers=1,
+                activate=flag('activate'),
+                skip_invalid=flag('skip_invalid'),
+                dry_run=flag('dry_run'),
+                base_url=request.build_absolute_uri('/'),
+                max_rows=self.max_rows,
+            )
+        except ImportFileError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"User ID: {request.user.id} imported {report['created']} users from {upload.name}")
+        if report['errors'] and not report['created'] and not flag('dry_run'):
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)